@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def get_order_status_distribution(df):
     return df['order_status'].value_counts().to_dict()
 
@@ -16,7 +19,8 @@ def get_top_5_months(df):
     monthly = df.groupby(['purchase_year', 'purchase_month']).size()
     monthly = monthly.reset_index(name='order_count')
 
-    top_5 = monthly.sort_values(by='order_count', ascending=False).head(5)
+    # Stable sort so ties keep calendar order
+    top_5 = monthly.sort_values(by='order_count', ascending=False, kind='stable').head(5)
 
     return top_5.to_dict(orient="records")
 
@@ -29,4 +33,21 @@ def get_yearly_summary(df):
     yearly = df.groupby('purchase_year').size()
     yearly = yearly.reset_index(name='order_count')
 
-    return yearly.to_dict(orient="records")
\ No newline at end of file
+    return yearly.to_dict(orient="records")
+# ==============================
+# Delivery Days Distribution
+# ==============================
+
+def get_delivery_days_histogram(df, max_days=60):
+    """
+    Order counts per whole delivery day, 0..max_days.
+    The last bucket also holds every slower delivery.
+    """
+    days = df['delivery_days'].dropna().to_numpy()
+    days = np.clip(days, 0, max_days).astype(np.int64)
+    counts = np.bincount(days, minlength=max_days + 1)
+
+    return {
+        "days": list(range(max_days + 1)),
+        "order_count": counts.tolist()
+    }
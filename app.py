@@ -1,24 +1,64 @@
+import time
+from startup import STARTUP_TIMINGS, IMPORT_TIMES, startup_report
+
+_imports_started = time.perf_counter()
+
 from pathlib import Path
 import os
-import json
+from io import BytesIO
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from flask import Flask, jsonify, render_template, send_file, request
+from flask import Flask, Response, g, has_request_context, jsonify, render_template, send_file, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException
 import pandas as pd
 
-from data_loader import load_data
-from preprocessing import preprocess_data, validate_data, data_quality_report
-from analysis import get_order_status_distribution, get_monthly_trend
-from metrics import calculate_metrics, delivery_performance_breakdown
-from insights import generate_insights
-from ml_engine import get_all_ml_insights, predict_future_orders, anomaly_detection, clustering_analysis
-from report_generator import generate_pdf_report, get_report_downloads
-from chatbot import analyze_data_with_ai, initialize_gemini
+from preprocessing import data_quality_report
+from backends import ANALYTICS_BACKENDS, create_backend
+from metrics import ROLLING_WINDOWS
+from cohorts import customer_codes, cohort_analysis
+from approximate import StratifiedSample, approx_metrics, approx_status_distribution, approx_anomalies, approx_clustering
+from parallel import start_pool
+from simulation import SimulationArrays, parse_scenarios, simulate_with_baseline
+from delivery_model import LATE_THRESHOLD, load_model, orders_frame, artifact_summary
+from ml_engine import get_all_ml_insights, predict_future_orders, clustering_analysis, compute_correlations, top_correlated_pairs
+from report_generator import report_inputs, report_charts, render_report_bytes, get_report_downloads
+from cache import VersionedCache
+from dashboard import DASHBOARD_SECTIONS, BACKEND_SECTIONS, MIN_COMPRESS_BYTES, parse_sections, dashboard_etag, choose_encoding, compress
+from exporter import EXPORT_FORMATS, EXPORT_TABLES, stream_export, parquet_available
+from chatbot import analyze_data_with_ai
+from olist_tables import OlistCatalog, MissingTableError, revenue_summary, seller_delivery_metrics, state_delivery_metrics
+from dataset_store import DatasetStore
+from live_updates import EventHub, format_event, version_change_listener
+from serialization import ARROW_MIMETYPE, dumps as serialization_dumps, columnar, arrow_ipc_bytes, arrow_available, negotiate_table_format
+from scheduler import init_app as init_scheduler
+from memory_budget import MemoryBudget, init_app as init_memory_budget
+from profiling import stage, record_error, register_cache, register_gauge, render_prometheus, init_app as init_profiling
+
+# Heavy optional modules (sklearn, google.generativeai) are not part of this;
+# they are imported on first use and reported under lazy_imports
+STARTUP_TIMINGS["imports"] = round(time.perf_counter() - _imports_started, 4)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes through serialization.dumps (orjson with
+    NumPy support when installed) and reports encoding as the serialize stage.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return serialization_dumps(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        with stage("serialize"):
+            return super().response(*args, **kwargs)
+
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
+init_profiling(app)
 
 # ===== GEMINI API SETUP =====
 # To use Google Gemini API for the chatbot:
@@ -29,22 +69,164 @@ app = Flask(__name__)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
+    # The client library is imported and configured on the first chatbot request
     print("✅ Gemini API key detected - AI chatbot will use Google Gemini")
-    initialize_gemini()
 else:
     print("⚠️  No GEMINI_API_KEY found - chatbot will use fallback analysis")
     print("   To enable Gemini: set environment variable GEMINI_API_KEY=your-key")
     print("   See GEMINI_SETUP.md for detailed instructions")
 
-# Load and preprocess dataset once
+# Load and preprocess dataset once.
+# STARTUP_MODE=lazy loads it on a background thread so the worker boots
+# immediately; data routes answer 503 until /ready reports ready.
 DATA_PATH = Path(__file__).resolve().parent / "olist_orders_dataset.csv"
-df = load_data(DATA_PATH)
-validate_data(df)
-df = preprocess_data(df)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager").lower()
+
+# Engine for the aggregate endpoints: pandas (default), sqlite, duckdb or parallel
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "pandas").lower()
+if ANALYTICS_BACKEND not in ANALYTICS_BACKENDS:
+    raise ValueError(f"ANALYTICS_BACKEND must be one of {', '.join(ANALYTICS_BACKENDS)}")
+# Optional database file for the SQL backends (default: in memory)
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH") or None
+
+if ANALYTICS_BACKEND == "parallel":
+    # Fork the aggregation workers before the loader and server threads start
+    start_pool()
+
+dataset_store = DatasetStore(DATA_PATH)
+if STARTUP_MODE == "lazy":
+    dataset_store.load_in_background()
+else:
+    dataset_store.load()
+
+# Seconds between checks for a changed dataset file; 0 disables hot reload
+DATASET_WATCH_SECONDS = float(os.getenv("DATASET_WATCH_SECONDS", "5"))
+
+
+def get_dataset_state():
+    """
+    The dataset state for the current request. It is taken once per request,
+    so a reload in the middle of a request never mixes two versions.
+    """
+    if not has_request_context():
+        return dataset_store.current()
+    if "dataset_state" not in g:
+        g.dataset_state = dataset_store.current()
+    return g.dataset_state
+
 
 def get_active_df():
     """Get the active dataframe"""
-    return df
+    return get_dataset_state().df
+
+
+def get_fact_index():
+    """Get the retrieval index built for the active dataframe"""
+    return get_dataset_state().fact_index
+
+
+def get_dataset_version():
+    """Get the version identifier of the active dataframe"""
+    return get_dataset_state().version
+
+
+# Results cached per dataset version (rendered reports, ...)
+result_cache = VersionedCache(max_workers=int(os.getenv("CACHE_WORKERS", "2")))
+register_cache("results", result_cache)
+register_gauge("app_startup_phase_seconds", "Duration of each startup phase.", lambda: STARTUP_TIMINGS, label_name="phase")
+register_gauge("app_lazy_import_seconds", "Time taken by deferred imports on first use.", lambda: IMPORT_TIMES, label_name="module")
+register_gauge("app_dataset_reloads", "Dataset versions swapped in by the file watcher.", lambda: dataset_store.reloads)
+
+
+def _drop_previous_version(old_state, new_state):
+    # Results (and backends) of the replaced version can no longer be requested
+    result_cache.invalidate(keep_version=new_state.version)
+
+
+# Dashboard sections pushed to /events subscribers when the version changes
+LIVE_SECTIONS, _unknown_live_sections = parse_sections(os.getenv("LIVE_UPDATE_SECTIONS"))
+if _unknown_live_sections:
+    raise ValueError(f"Unknown LIVE_UPDATE_SECTIONS: {', '.join(_unknown_live_sections)}")
+
+live_updates = EventHub()
+register_gauge("app_sse_subscribers", "Open /events streams.", lambda: live_updates.subscribers)
+
+
+def _live_sections(state):
+    # Through the version cache: the old version's sections are usually there already
+    return {name: _dashboard_section(state, name) for name in LIVE_SECTIONS}
+
+
+# Diff before the previous version's results are dropped
+dataset_store.on_swap(version_change_listener(live_updates, _live_sections))
+dataset_store.on_swap(_drop_previous_version)
+if DATASET_WATCH_SECONDS > 0:
+    dataset_store.watch(DATASET_WATCH_SECONDS)
+
+def get_correlations(method=None):
+    """Correlation engine result for the active dataset, computed once per version."""
+    state = get_dataset_state()
+    return result_cache.get(
+        state.version, f"correlations:{method or 'auto'}",
+        lambda: compute_correlations(state.df, method=method, top_k=50)
+    )
+
+
+def get_backend():
+    """Analytics backend for the active dataset."""
+    return backend_for(get_dataset_state())
+
+
+def backend_for(state):
+    """
+    Analytics backend for a dataset state. ``pandas`` works on the loaded
+    frame; ``sqlite``/``duckdb`` are loaded from the CSV and ``parallel``
+    encodes its partitioned columns once per version.
+    """
+    if ANALYTICS_BACKEND == "pandas":
+        return create_backend("pandas", df=state.df)
+    return result_cache.get(
+        state.version, f"backend:{ANALYTICS_BACKEND}",
+        lambda: create_backend(ANALYTICS_BACKEND, df=state.df, csv_path=state.path, version=state.version, db_path=ANALYTICS_DB_PATH)
+    )
+
+
+def get_olist_catalog():
+    """Related Olist tables joined to the active orders, one catalog per version."""
+    state = get_dataset_state()
+    return result_cache.get(state.version, "olist-catalog", lambda: OlistCatalog(state.df, DATA_PATH.parent))
+
+
+# Endpoints that work before the dataset has loaded
+NO_DATASET_ENDPOINTS = {"home", "static", "health", "ready", "metrics_internal", "score", "events", "memory"}
+
+
+@app.before_request
+def require_dataset():
+    if request.endpoint in NO_DATASET_ENDPOINTS or dataset_store.ready:
+        return None
+    status = dataset_store.status()
+    return jsonify({"error": "Dataset is not loaded yet", **status}), 503, {"Retry-After": "5"}
+
+
+# Cost classes with their own concurrency limits and queues (registered
+# after require_dataset so requests that would 503 never take a slot)
+scheduler = init_scheduler(app)
+
+# Memory use against MEMORY_BUDGET_MB: evicts cache entries, samples and rejects heavy work under pressure
+memory_budget = MemoryBudget(result_cache, lambda: dataset_store.current() if dataset_store.ready else None)
+init_memory_budget(app, memory_budget, scheduler)
+register_gauge("app_memory_bytes", "Memory accounted against the budget.", lambda: {
+    "budget": memory_budget.limit or 0,
+    "used": memory_budget.used_bytes(),
+    "accounted": memory_budget.accounted_bytes(),
+    "dataset": memory_budget.dataset_bytes(),
+    "cache": sum(memory_budget.cache_sizes().values()),
+    "reserved": memory_budget.reserved_bytes()
+}, label_name="component")
+
+
+REPORT_TIMEOUT_SECONDS = float(os.getenv("REPORT_TIMEOUT_SECONDS", "60"))
 
 
 @app.route("/")
@@ -69,7 +251,8 @@ def chatbot():
         active_df = get_active_df()
         
         # Use Gemini AI to analyze the data and answer the question
-        response = analyze_data_with_ai(active_df, question)
+        with stage("chatbot"):
+            response = analyze_data_with_ai(active_df, question, get_fact_index(), get_correlations)
         
         return jsonify({
             "question": question,
@@ -78,28 +261,94 @@ def chatbot():
         })
     
     except Exception as e:
+        record_error(e)
         return jsonify({"error": f"Chatbot error: {str(e)}"}), 500
 
 
+def table_response(frame, records):
+    """
+    Send a tabular result. ``records(frame)`` builds the route's default
+    JSON shape; ``format=columnar`` sends ``{column: [values]}`` and
+    ``format=arrow`` (or an Arrow Accept header) sends an Arrow IPC stream.
+    """
+    fmt = negotiate_table_format(request.args, request.headers.get("Accept"))
+    if fmt == "arrow" and not arrow_available():
+        return jsonify({"error": "Arrow responses require pyarrow. Install with: pip install pyarrow"}), 406
+
+    with stage("serialize"):
+        if fmt == "arrow":
+            return Response(arrow_ipc_bytes(frame), mimetype=ARROW_MIMETYPE)
+        payload = columnar(frame) if fmt == "columnar" else records(frame)
+        return Response(serialization_dumps(payload), mimetype="application/json")
+
+
+def _records(frame):
+    return frame.to_dict(orient="records")
+
+
+def approximate_response(name, approximate, exact):
+    """
+    Answer ``mode=approx`` from the version's stratified sample, with 95%
+    intervals, and start the exact computation in the background. Once the
+    exact result is ready it is returned instead (``mode: exact``). Under
+    memory pressure the exact computation is not started.
+    """
+    state = get_dataset_state()
+    if memory_budget.degraded:
+        exact_future = result_cache.peek(state.version, f"exact:{name}")
+    else:
+        exact_future = result_cache.submit(state.version, f"exact:{name}", exact)
+    if exact_future is not None and exact_future.done() and exact_future.exception() is None:
+        return jsonify({"mode": "exact", "result": exact_future.result(), "confidence_intervals": {}, "exact_ready": True})
+
+    with stage("aggregate"):
+        sample = result_cache.get(state.version, "approx:sample", lambda: StratifiedSample(state.df))
+        payload = result_cache.get(state.version, f"approx:{name}", lambda: approximate(sample))
+    return jsonify({"mode": "approx", **payload, "exact_ready": False})
+
+
+def use_sample(mode):
+    """True when a heavy route should answer from the sample: asked for, or memory is under pressure."""
+    if mode == "approx":
+        return True
+    if mode is None and memory_budget.degraded:
+        memory_budget.degraded_responses += 1
+        return True
+    return False
+
+
 @app.route("/metrics")
 def metrics():
+    """Headline metrics. ``mode=approx`` answers from the stratified sample."""
     try:
-        return jsonify(calculate_metrics(get_active_df()))
+        if request.args.get("mode") == "approx":
+            return approximate_response("metrics", approx_metrics, get_backend().metrics)
+        with stage("aggregate"):
+            result = get_backend().metrics()
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({"error": f"Metrics calculation failed: {str(e)}", "total_orders": 0, "average_delivery_days": 0})
 
 
 @app.route("/order-status")
 def order_status():
+    """Order status distribution. ``mode=approx`` answers from the stratified sample."""
     try:
+        if request.args.get("mode") == "approx":
+            return approximate_response("order-status", approx_status_distribution, get_backend().order_status_distribution)
         active_df = get_active_df()
         # Try to get order status distribution
         if 'order_status' in active_df.columns:
-            return jsonify(active_df['order_status'].value_counts().to_dict())
+            with stage("aggregate"):
+                distribution = get_backend().order_status_distribution()
+                frame = pd.DataFrame({'order_status': list(distribution), 'order_count': list(distribution.values())})
+            return table_response(frame, lambda f: distribution)
         else:
             # Return empty dict if column doesn't exist
             return jsonify({})
     except Exception as e:
+        record_error(e)
         return jsonify({})
 
 
@@ -112,44 +361,91 @@ def monthly_trend():
             # Try to create from date column if available
             date_cols = [col for col in active_df.columns if 'date' in col.lower() or 'time' in col.lower()]
             if date_cols:
-                temp_df = active_df.copy()
-                date_col = date_cols[0]
-                temp_df[date_col] = pd.to_datetime(temp_df[date_col], errors='coerce')
-                temp_df['purchase_year'] = temp_df[date_col].dt.year
-                temp_df['purchase_month'] = temp_df[date_col].dt.month
-                monthly = temp_df.groupby(['purchase_year', 'purchase_month']).size()
-                monthly = monthly.reset_index(name='order_count')
-                return jsonify(monthly.to_dict(orient="records"))
+                with stage("aggregate"):
+                    # Group by the parsed column directly instead of copying the frame
+                    dates = pd.to_datetime(active_df[date_cols[0]], errors='coerce')
+                    monthly = dates.groupby([dates.dt.year.rename('purchase_year'), dates.dt.month.rename('purchase_month')]).size()
+                    monthly = monthly.reset_index(name='order_count')
+                return table_response(monthly, _records)
             return jsonify([])
         
-        monthly = active_df.groupby(['purchase_year', 'purchase_month']).size()
-        monthly = monthly.reset_index(name='order_count')
-        return jsonify(monthly.to_dict(orient="records"))
+        with stage("aggregate"):
+            monthly = pd.DataFrame(get_backend().monthly_trend(), columns=['purchase_year', 'purchase_month', 'order_count'])
+        return table_response(monthly, _records)
     except Exception as e:
+        record_error(e)
         return jsonify([])
 
 
 @app.route("/insights")
 def insights():
     try:
-        insight = generate_insights(get_active_df())
+        with stage("aggregate"):
+            insight = get_backend().insights()
         return jsonify({"insight": insight})
     except Exception as e:
+        record_error(e)
         return jsonify({"insight": f"Dataset loaded. Ask the AI chatbot for insights about your data!"})
 
 
 @app.route("/delivery-breakdown")
 def delivery_breakdown():
     try:
-        return jsonify(delivery_performance_breakdown(get_active_df()))
+        with stage("aggregate"):
+            result = get_backend().delivery_breakdown()
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({})
 
+@app.route("/kpi/rolling")
+def kpi_rolling():
+    """Rolling order volume, late-delivery rate and average delivery days for every day.
+
+    ``windows`` is a comma separated list of window lengths in days
+    (default 7,30,90). The series is cached per dataset version.
+    """
+    try:
+        windows = tuple(sorted({int(w) for w in request.args.get("windows", "").split(",") if w.strip()})) or ROLLING_WINDOWS
+    except ValueError:
+        return jsonify({"error": "windows must be comma separated integers"}), 400
+    if not all(1 <= w <= 3650 for w in windows):
+        return jsonify({"error": "window lengths must be between 1 and 3650 days"}), 400
+
+    try:
+        backend = get_backend()
+        with stage("aggregate"):
+            result = result_cache.get(
+                get_dataset_version(), f"kpi:rolling:{','.join(map(str, windows))}", lambda: backend.rolling_kpis(windows)
+            )
+        return jsonify(result)
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/data-quality")
 def data_quality():
+    """Data quality profile, cached per dataset version.
+
+    ``mode`` is exact or sampled; by default large datasets are sampled,
+    and every dataset is while memory is under pressure.
+    """
+    mode = request.args.get("mode")
+    if mode not in (None, "exact", "sampled"):
+        return jsonify({"error": "mode must be exact or sampled"}), 400
+    if mode is None and memory_budget.degraded:
+        memory_budget.degraded_responses += 1
+        mode = "sampled"
     try:
-        return jsonify(data_quality_report(get_active_df()))
+        active_df = get_active_df()
+        with stage("aggregate"):
+            result = result_cache.get(
+                get_dataset_version(), f"data-quality:{mode or 'auto'}", lambda: data_quality_report(active_df, mode)
+            )
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)})
 
 
@@ -161,26 +457,119 @@ def data_quality():
 def predict():
     """Machine Learning predictions for future orders."""
     try:
-        return jsonify(predict_future_orders(get_active_df(), months_ahead=6))
+        with stage("ml_fit"):
+            result = predict_future_orders(get_active_df(), months_ahead=6)
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({"message": "Predictions require specific data columns"})
 
 
+# Largest batch /score accepts in one request
+SCORE_MAX_BATCH = int(os.getenv("SCORE_MAX_BATCH", "10000"))
+
+
+@app.route("/score", methods=["POST"])
+def score():
+    """Score a batch of orders with the trained delivery model.
+
+    The body is ``{"orders": [...]}`` (or a bare list) of order records with
+    the Olist timestamp columns and ``order_status``. Orders whose late
+    probability reaches ``threshold`` (default 0.5) are flagged ``at_risk``.
+    """
+    data = request.get_json(silent=True)
+    records = data.get("orders") if isinstance(data, dict) else data
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        return jsonify({"error": "Expected a JSON list of orders, or {\"orders\": [...]}"}), 400
+    if len(records) > SCORE_MAX_BATCH:
+        return jsonify({"error": f"At most {SCORE_MAX_BATCH} orders per request"}), 413
+    try:
+        threshold = float(request.args.get("threshold", LATE_THRESHOLD))
+    except ValueError:
+        return jsonify({"error": "threshold must be a number"}), 400
+
+    try:
+        model = load_model()
+        if model is None:
+            return jsonify({"error": "No delivery model has been trained. Run: python delivery_model.py train"}), 503
+
+        with stage("ml_fit"):
+            scores = model.score(orders_frame(records), threshold) if records else None
+        info = artifact_summary(model.artifact)
+        if dataset_store.ready:
+            # Trained on a different version of the dataset than the one being served
+            info["stale"] = model.dataset_version != dataset_store.current().version
+        return jsonify({
+            "model": info,
+            "predictions": _records(scores) if scores is not None else [],
+            "at_risk": int(scores["at_risk"].sum()) if scores is not None else 0
+        })
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/simulate", methods=["POST"])
+def simulate():
+    """What-if late rates for a list of delivery scenarios.
+
+    The body is ``{"scenarios": [...]}`` (or a bare list). Each scenario may
+    set ``estimate_offset_days``, ``delivery_offset_days``,
+    ``delivery_lag_scale`` and ``statuses``; every one gets the /metrics and
+    /delivery-breakdown results plus its change against the baseline.
+    """
+    data = request.get_json(silent=True)
+    raw = data.get("scenarios") if isinstance(data, dict) else data
+    try:
+        scenarios = parse_scenarios(raw)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        state = get_dataset_state()
+        with stage("aggregate"):
+            arrays = result_cache.get(state.version, "simulate:arrays", lambda: SimulationArrays(state.df))
+            result = simulate_with_baseline(arrays, scenarios)
+        return jsonify(result)
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/anomalies")
 def anomalies():
-    """Detect anomalies in delivery performance."""
+    """Detect anomalies in delivery performance.
+
+    ``mode=approx`` answers from the stratified sample, as does a request
+    without ``mode`` while memory is under pressure.
+    """
     try:
-        return jsonify(anomaly_detection(get_active_df()))
+        if use_sample(request.args.get("mode")):
+            return approximate_response("anomalies", approx_anomalies, get_backend().anomalies)
+        with stage("ml_fit"):
+            result = get_backend().anomalies()
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({"message": "Anomaly detection requires numeric columns"})
 
 
 @app.route("/clustering")
 def clustering():
-    """Perform clustering analysis on delivery data."""
+    """Perform clustering analysis on delivery data.
+
+    ``mode=approx`` answers from the stratified sample, as does a request
+    without ``mode`` while memory is under pressure.
+    """
     try:
-        return jsonify(clustering_analysis(get_active_df()))
+        if use_sample(request.args.get("mode")):
+            active_df = get_active_df()
+            return approximate_response("clustering", approx_clustering, lambda: clustering_analysis(active_df))
+        with stage("ml_fit"):
+            result = clustering_analysis(get_active_df())
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({"message": "Clustering requires numeric data"})
 
 
@@ -188,36 +577,281 @@ def clustering():
 def ml_insights():
     """Get comprehensive ML-based insights."""
     try:
-        return jsonify(get_all_ml_insights(get_active_df()))
+        with stage("ml_fit"):
+            result = get_all_ml_insights(get_active_df(), get_correlations())
+        return jsonify(result)
     except Exception as e:
+        record_error(e)
         return jsonify({"message": "ML insights not available for this dataset"})
 
 
+CORRELATIONS_MAX_TOP_K = int(os.getenv("CORRELATIONS_MAX_TOP_K", "1000"))
+
+
+@app.route("/correlations")
+def correlations():
+    """Correlation matrix and the top-k most correlated column pairs.
+
+    ``method`` is pearson or spearman (default: pearson, spearman on a row
+    sample for wide data) and ``top_k`` limits the returned pairs.
+    """
+    method = request.args.get("method")
+    if method not in (None, "pearson", "spearman"):
+        return jsonify({"error": "method must be pearson or spearman"}), 400
+    try:
+        top_k = int(request.args.get("top_k", 10))
+    except ValueError:
+        return jsonify({"error": "top_k must be an integer"}), 400
+    if not 1 <= top_k <= CORRELATIONS_MAX_TOP_K:
+        return jsonify({"error": f"top_k must be between 1 and {CORRELATIONS_MAX_TOP_K}"}), 400
+    try:
+        with stage("aggregate"):
+            result = get_correlations(method)
+        pairs = result["top_pairs"][:top_k]
+        if top_k > len(result["top_pairs"]):
+            pairs = top_correlated_pairs(result["columns"], result["matrix"], top_k)
+        return jsonify({
+            "success": True,
+            "method": result["method"],
+            "rows_used": result["rows_used"],
+            "columns": result["columns"],
+            "matrix": result["matrix"],
+            "top_pairs": pairs
+        })
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 400
+
+
+# ==============================
+# Multi-table Olist Endpoints
+# ==============================
+
+def _catalog_response(name, compute):
+    """Run a multi-table query through the version cache."""
+    try:
+        catalog = get_olist_catalog()
+        with stage("aggregate"):
+            result = result_cache.get(get_dataset_version(), name, lambda: compute(catalog))
+        return jsonify(result)
+    except MissingTableError as e:
+        return jsonify({"error": str(e), "available_tables": get_olist_catalog().available()}), 404
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/revenue")
+def revenue():
+    """Revenue, freight and payment totals from the items and payments tables."""
+    return _catalog_response("olist:revenue", revenue_summary)
+
+
+SELLERS_MAX_LIMIT = int(os.getenv("SELLERS_MAX_LIMIT", "1000"))
+
+
+@app.route("/sellers/delivery")
+def sellers_delivery():
+    """Delivery metrics per seller (``limit`` busiest sellers, default 20)."""
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= SELLERS_MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {SELLERS_MAX_LIMIT}"}), 400
+    return _catalog_response(f"olist:sellers:{limit}", lambda catalog: seller_delivery_metrics(catalog, limit))
+
+
+@app.route("/states/delivery")
+def states_delivery():
+    """Delivery metrics per customer state."""
+    return _catalog_response("olist:states", state_delivery_metrics)
+
+
+# ==============================
+# Customer Cohorts
+# ==============================
+
+COHORT_SECTIONS = {"retention", "repeat", "second-order", "delivery"}
+
+
+def get_cohorts():
+    """Cohort analysis for the active dataset, computed once per version."""
+    state = get_dataset_state()
+    catalog = get_olist_catalog()
+
+    def compute():
+        codes, key = customer_codes(state.df, catalog)
+        return cohort_analysis(state.df, codes, key)
+
+    return result_cache.get(state.version, "cohorts", compute)
+
+
+@app.route("/cohorts")
+@app.route("/cohorts/<section>")
+def cohorts(section=None):
+    """Cohorts by first-purchase month: retention, repeat orders, time to second order, delivery.
+
+    ``/cohorts/<section>`` returns one of retention, repeat, second-order or delivery.
+    """
+    if section is not None and section not in COHORT_SECTIONS:
+        return jsonify({"error": f"Unknown section '{section}'", "sections": sorted(COHORT_SECTIONS)}), 404
+    try:
+        with stage("aggregate"):
+            result = get_cohorts()
+        if section is None or not result["cohorts"]:
+            return jsonify(result)
+        keys = ("customer_key", "customers", "cohorts", "cohort_sizes")
+        if section == "retention":
+            keys += ("months_since_first_order",)
+        payload = {key: result[key] for key in keys}
+        # Same key as in the full response
+        name = section.replace("-", "_")
+        payload[name] = result[name]
+        return jsonify(payload)
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/report")
 def report():
-    """Download PDF report."""
+    """Download PDF report.
+
+    The PDF is rendered once per dataset version on a background worker and
+    served from the cache afterwards. Pass ``wait=0`` to get a 202 response
+    instead of blocking while the report is still rendering.
+    """
     try:
         active_df = get_active_df()
-        metrics = calculate_metrics(active_df)
-        status_dist = get_order_status_distribution(active_df)
-        trends = get_monthly_trend(active_df)
-        insights_text = generate_insights(active_df)
-        
-        pdf_buffer = generate_pdf_report(active_df, metrics, status_dist, trends, insights_text)
+        version = get_dataset_version()
+
+        def render():
+            # Aggregates and chart drawables are cached separately so a re-render skips both
+            with stage("aggregate"):
+                inputs = result_cache.get(version, "report:inputs", lambda: report_inputs(active_df))
+            with stage("render"):
+                charts = result_cache.get(version, "report:charts", lambda: report_charts(inputs))
+                return render_report_bytes(inputs, charts)
+
+        future = result_cache.submit(version, "report:pdf", render)
+
+        if request.args.get("wait") == "0" and not future.done():
+            return jsonify({"status": "rendering", "message": "Report is being generated, retry shortly."}), 202
+
+        pdf_bytes = future.result(timeout=REPORT_TIMEOUT_SECONDS)
         
-        if pdf_buffer is None:
+        if pdf_bytes is None:
             return jsonify({"error": "PDF generation requires reportlab. Install with: pip install reportlab"}), 400
         
         return send_file(
-            pdf_buffer,
+            BytesIO(pdf_bytes),
             mimetype="application/pdf",
             as_attachment=True,
             download_name=f"order-analytics-report-{pd.Timestamp.now().strftime('%Y%m%d')}.pdf"
         )
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 500
 
 
+# ==============================
+# Batched Dashboard Endpoint
+# ==============================
+
+def _dashboard_section(state, name, failed=None):
+    """
+    Compute one dashboard section through the version cache, on the
+    analytics backend where it has one. A failure is returned as
+    ``{"error": ...}`` and its name appended to ``failed``.
+    """
+    def compute():
+        if name in BACKEND_SECTIONS:
+            return BACKEND_SECTIONS[name](backend_for(state))
+        return DASHBOARD_SECTIONS[name](state.df)
+
+    try:
+        with stage("ml_fit" if name in ("predictions", "anomalies", "clustering") else "aggregate"):
+            return result_cache.get(state.version, f"dashboard:{name}", compute)
+    except Exception as e:
+        record_error(e)
+        if failed is not None:
+            failed.append(name)
+        return {"error": str(e)}
+
+
+class _SectionsFailed(Exception):
+    """A dashboard payload with failed sections, which must not be cached."""
+
+    def __init__(self, payload):
+        super().__init__("dashboard sections failed")
+        self.payload = payload
+
+
+@app.route("/dashboard")
+def dashboard():
+    """All dashboard sections in one response.
+
+    ``sections`` selects a comma separated subset. The ETag is derived
+    from the dataset version and the content encoding, so unchanged data
+    answers ``If-None-Match`` with 304. Bodies are compressed with brotli
+    or gzip when accepted. A response with a failed section is neither
+    cached nor tagged, so the next request retries it.
+    """
+    sections, unknown = parse_sections(request.args.get("sections"))
+    if unknown:
+        return jsonify({"error": f"Unknown sections: {unknown}", "sections": list(DASHBOARD_SECTIONS)}), 400
+
+    state = get_dataset_state()
+    version = state.version
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    etag = dashboard_etag(version, sections, encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status=304, headers=headers)
+
+    def encode():
+        failed = []
+        payload = {name: _dashboard_section(state, name, failed) for name in sections}
+        if failed:
+            raise _SectionsFailed(payload)
+        with stage("serialize"):
+            body = app.json.dumps(payload).encode("utf-8")
+            if len(body) < MIN_COMPRESS_BYTES:
+                return body, None
+            return compress(body, encoding), encoding
+
+    try:
+        body, body_encoding = result_cache.get(version, f"dashboard-body:{','.join(sections)}:{encoding}", encode)
+    except _SectionsFailed as e:
+        return jsonify(e.payload), 200, {"Cache-Control": "no-store"}
+    if body_encoding:
+        headers["Content-Encoding"] = body_encoding
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+@app.route("/events")
+def events():
+    """Server-sent dashboard updates.
+
+    A ``hello`` event carries the current dataset version on connect; after
+    every reload a ``diff`` event carries the changed dashboard sections.
+    Clients whose version does not match ``previous_version`` re-fetch
+    ``/dashboard``.
+    """
+    subscriber = live_updates.subscribe()
+    first_events = []
+    if dataset_store.ready:
+        version = dataset_store.current().version
+        first_events.append(format_event("hello", {"version": version, "sections": LIVE_SECTIONS}, version))
+    return Response(
+        stream_with_context(live_updates.stream(subscriber, first_events)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/report-formats")
 def report_formats():
     """Get available report download formats."""
@@ -225,12 +859,44 @@ def report_formats():
     return jsonify(get_report_downloads(active_df, {}, {}, {}, ""))
 
 
+@app.route("/export/<table>")
+def export(table):
+    """Stream the dataset or an aggregate table as CSV, JSON Lines or Parquet.
+
+    Query parameters: ``format`` (csv, jsonl, parquet) and the filters
+    ``status``, ``year``, ``month``, ``start``, ``end``.
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if table not in EXPORT_TABLES:
+        return jsonify({"error": f"Unknown table '{table}'", "tables": list(EXPORT_TABLES)}), 404
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}'", "formats": list(EXPORT_FORMATS)}), 400
+    if fmt == "parquet" and not parquet_available():
+        return jsonify({"error": "Parquet export requires pyarrow. Install with: pip install pyarrow"}), 400
+
+    try:
+        chunks = stream_export(get_active_df(), table, fmt, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filename = f"{table}-{pd.Timestamp.now().strftime('%Y%m%d')}.{EXPORT_FORMATS[fmt]['extension']}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt]["mimetype"],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 # ==============================
 # Rakshith - Global Error Handler
 # ==============================
 
 @app.errorhandler(Exception)
 def handle_exception(e):
+    # Let routing errors (404, 405, ...) keep their own status code
+    if isinstance(e, HTTPException):
+        return e
+    record_error(e)
     return jsonify({
         "error": str(e),
         "message": "An internal server error occurred."
@@ -248,7 +914,7 @@ def system_info():
     return jsonify({
         "project_name": "AI Powered Order Analytics",
         "backend_framework": "Flask",
-        "dataset": current_dataset['filename'],
+        "dataset": DATA_PATH.name,
         "total_records": len(active_df),
         "version": "2.1.0",
         "features": [
@@ -264,6 +930,27 @@ def system_info():
     })
 
 
+@app.route("/metrics-internal")
+def metrics_internal():
+    """Profiling metrics in the Prometheus text format."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/memory")
+def memory():
+    """Memory diagnostics: budget, pressure level, dataset, cache and in-flight request sizes."""
+    return jsonify(memory_budget.report())
+
+
+@app.route("/ready")
+def ready():
+    """Readiness check: 200 once the dataset is loaded, 503 before."""
+    status = dataset_store.status()
+    status["startup"] = startup_report()
+    status["admission"] = scheduler.status()
+    return jsonify(status), (200 if dataset_store.ready else 503)
+
+
 @app.route("/health")
 def health():
     """Health check endpoint."""
@@ -0,0 +1,225 @@
+"""
+Approximate answers from a stratified sample.
+
+One sample is drawn per dataset version, stratified by purchase month
+and order status: every stratum gets a share of the sample proportional
+to its size (with a floor, so small strata are still represented), and
+each sampled row carries the weight N_h / n_h. Estimates are weighted
+ratios with 95% intervals from the linearized stratified variance, so
+their cost depends on the sample size, not on the dataset size.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from ml_engine import _clustering_features, _fit_clusters
+
+APPROX_SAMPLE_ROWS = int(os.getenv("APPROX_SAMPLE_ROWS", "50000"))
+# Rows every stratum keeps (or all of them, if it is smaller)
+MIN_STRATUM_ROWS = 20
+Z_95 = 1.96
+
+
+class StratifiedSample:
+    """A month x status stratified sample of a preprocessed frame."""
+
+    def __init__(self, df, target_rows=APPROX_SAMPLE_ROWS, seed=42):
+        self.population = int(len(df))
+
+        month_key = (df['purchase_year'] * 12 + df['purchase_month']).fillna(-1).astype(np.int64)
+        status_codes, _ = pd.factorize(df['order_status'], use_na_sentinel=False)
+        strata, _ = pd.factorize(month_key.to_numpy() * 1000 + status_codes)
+
+        stratum_sizes = np.bincount(strata)
+        if self.population:
+            wanted = np.round(target_rows * stratum_sizes / self.population).astype(np.int64)
+        else:
+            wanted = stratum_sizes
+        sample_sizes = np.minimum(np.maximum(wanted, MIN_STRATUM_ROWS), stratum_sizes)
+
+        # Random order within each stratum, then keep the first n_h rows of each
+        rng = np.random.default_rng(seed)
+        order = np.lexsort((rng.random(len(strata)), strata))
+        starts = np.cumsum(stratum_sizes) - stratum_sizes
+        rank = np.arange(len(order)) - starts[strata[order]]
+        chosen = np.sort(order[rank < sample_sizes[strata[order]]])
+
+        self.frame = df.iloc[chosen]
+        self.strata = strata[chosen]
+        self.stratum_sizes = stratum_sizes
+        self.sample_sizes = sample_sizes
+        self.weights = (stratum_sizes / np.maximum(sample_sizes, 1))[self.strata]
+
+    @property
+    def rows(self):
+        return int(len(self.frame))
+
+    def ratio(self, y, x=None):
+        """
+        Estimate sum(y) / sum(x) over the population with a 95% interval.
+        With ``x`` omitted this is the population mean (or rate) of ``y``.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        x = np.ones_like(y) if x is None else np.asarray(x, dtype=np.float64)
+        total_x = float(np.sum(self.weights * x))
+        if total_x == 0:
+            return None, (None, None)
+        estimate = float(np.sum(self.weights * y)) / total_x
+
+        # Linearized variance: per-stratum sample variance of y - R x
+        z = y - estimate * x
+        n = self.sample_sizes.astype(np.float64)
+        sum_z = np.bincount(self.strata, weights=z, minlength=len(n))
+        sum_z2 = np.bincount(self.strata, weights=z * z, minlength=len(n))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s2 = np.where(n > 1, (sum_z2 - sum_z ** 2 / n) / (n - 1), 0.0)
+            fpc = 1 - n / self.stratum_sizes
+            variance = np.sum(np.where(n > 0, self.stratum_sizes ** 2 * fpc * s2 / n, 0.0)) / total_x ** 2
+        margin = Z_95 * float(np.sqrt(max(variance, 0.0)))
+        return estimate, (estimate - margin, estimate + margin)
+
+    def quantile(self, values, q):
+        """Weighted quantile of ``values`` (NaN ignored)."""
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        order = np.argsort(values[keep], kind='stable')
+        sorted_values = values[keep][order]
+        weights = self.weights[keep][order]
+        cumulative = np.cumsum(weights) - weights / 2
+        return float(np.interp(q * weights.sum(), cumulative, sorted_values))
+
+
+def _rounded(value, digits=2):
+    return None if value is None else round(value, digits)
+
+
+def _interval(bounds, scale=1.0, digits=2):
+    low, high = bounds
+    if low is None:
+        return None
+    return [round(low * scale, digits), round(high * scale, digits)]
+
+
+def _envelope(sample, result, intervals):
+    return {
+        "result": result,
+        "confidence_intervals": intervals,
+        "confidence": 0.95,
+        "sample_rows": sample.rows,
+        "population_rows": sample.population
+    }
+
+
+# ==============================
+# Approximate endpoints
+# ==============================
+
+def approx_metrics(sample):
+    """calculate_metrics estimated from the sample. total_orders is exact."""
+    df = sample.frame
+    delivery_days = df['delivery_days'].to_numpy(dtype=np.float64)
+    has_days = ~np.isnan(delivery_days)
+    late = (df['order_delivered_customer_date'] > df['order_estimated_delivery_date']).to_numpy()
+
+    avg_days, avg_bounds = sample.ratio(np.where(has_days, delivery_days, 0), has_days)
+    late_rate, late_bounds = sample.ratio(late)
+    result = {
+        "total_orders": sample.population,
+        "average_delivery_days": _rounded(avg_days) if avg_days is not None else 0.0,
+        "late_delivery_percentage": _rounded(late_rate * 100) if late_rate is not None else 0.0
+    }
+    return _envelope(sample, result, {
+        "average_delivery_days": _interval(avg_bounds),
+        "late_delivery_percentage": _interval(late_bounds, 100)
+    })
+
+
+def approx_status_distribution(sample):
+    """
+    Order status counts. Status is a stratification variable, so the counts
+    are the exact stratum sizes and the intervals have zero width.
+    """
+    statuses = sample.frame['order_status'].to_numpy(dtype=object)
+    first = np.unique(sample.strata, return_index=True)[1]
+    counts = pd.Series(sample.stratum_sizes[sample.strata[first]], index=statuses[first])
+    counts = counts[counts.index.notna()].groupby(level=0, sort=False).sum().sort_values(ascending=False, kind='stable')
+    result = {status: int(count) for status, count in counts.items()}
+    return _envelope(sample, result, {status: [count, count] for status, count in result.items()})
+
+
+def approx_anomalies(sample):
+    """anomaly_detection estimated from the sample: weighted IQR fences and estimated counts."""
+    delivery_days = sample.frame['delivery_days'].to_numpy(dtype=np.float64)
+    has_days = ~np.isnan(delivery_days)
+    if has_days.sum() < 5:
+        return _envelope(sample, {"error": "Insufficient data for anomaly detection"}, {})
+
+    Q1 = sample.quantile(delivery_days, 0.25)
+    Q3 = sample.quantile(delivery_days, 0.75)
+    IQR = Q3 - Q1
+    lower_bound, upper_bound = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+
+    population = sample.population
+    fast, fast_bounds = sample.ratio(has_days & (delivery_days < lower_bound))
+    slow, slow_bounds = sample.ratio(has_days & (delivery_days > upper_bound))
+    anomalies, anomaly_bounds = sample.ratio(has_days & ((delivery_days < lower_bound) | (delivery_days > upper_bound)))
+
+    result = {
+        "success": True,
+        "total_records": population,
+        "anomalies_detected": int(round(anomalies * population)),
+        "anomaly_percentage": round(anomalies * 100, 2),
+        "lower_bound": round(lower_bound, 2),
+        "upper_bound": round(upper_bound, 2),
+        "details": {
+            "fast_deliveries": int(round(fast * population)),
+            "slow_deliveries": int(round(slow * population))
+        }
+    }
+    return _envelope(sample, result, {
+        "anomalies_detected": _interval(anomaly_bounds, population, 0),
+        "anomaly_percentage": _interval(anomaly_bounds, 100),
+        "details.fast_deliveries": _interval(fast_bounds, population, 0),
+        "details.slow_deliveries": _interval(slow_bounds, population, 0)
+    })
+
+
+def approx_clustering(sample):
+    """
+    clustering_analysis on the sample. The model is fitted on the sampled
+    rows; cluster sizes and delivery stats are weighted population estimates.
+    """
+    features = _clustering_features(sample.frame)
+    if len(features) < 3:
+        return _envelope(sample, {"error": "Insufficient data for clustering"}, {})
+
+    kmeans, clusters = _fit_clusters(features)
+    # Cluster label per sampled row, -1 where features were missing
+    labels = np.full(sample.rows, -1)
+    labels[sample.frame.index.get_indexer(features.index)] = clusters
+    delivery_days = np.nan_to_num(sample.frame['delivery_days'].to_numpy(dtype=np.float64))
+
+    result = {
+        "success": True,
+        "clusters": int(kmeans.n_clusters),
+        "inertia": float(kmeans.inertia_) * sample.population / sample.rows,
+        "cluster_details": []
+    }
+    intervals = {}
+    for i in range(kmeans.n_clusters):
+        member = labels == i
+        share, share_bounds = sample.ratio(member)
+        mean, mean_bounds = sample.ratio(delivery_days * member, member)
+        second, _ = sample.ratio(delivery_days ** 2 * member, member)
+        std = float(np.sqrt(max(second - mean ** 2, 0.0))) if mean is not None else None
+        result["cluster_details"].append({
+            "cluster": i,
+            "size": int(round(share * sample.population)),
+            "avg_delivery_days": _rounded(mean),
+            "std_delivery_days": _rounded(std)
+        })
+        intervals[f"cluster_details.{i}.size"] = _interval(share_bounds, sample.population, 0)
+        intervals[f"cluster_details.{i}.avg_delivery_days"] = _interval(mean_bounds)
+    return _envelope(sample, result, intervals)
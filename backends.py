@@ -0,0 +1,406 @@
+"""
+Pluggable analytics backends.
+
+The aggregate endpoints (metrics, status distribution, monthly trend,
+insights, ...) can run either on the in-memory pandas frame (the
+default) or on an embedded SQL engine loaded from the CSV: SQLite with
+indexes, or DuckDB when it is installed. ``parallel`` runs the same
+aggregates as a map/combine over row partitions (see parallel.py). The CSV is streamed into the
+engine in chunks through the same ``preprocess_data`` step, and every
+backend shapes its result with the same helpers, so the return values
+are identical. ``check_backend_parity`` compares two backends.
+
+    python backends.py olist_orders_dataset.csv --backend all
+"""
+
+import argparse
+import importlib.util
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from analysis import get_order_status_distribution, get_monthly_trend, get_top_5_months, get_yearly_summary
+from insights import generate_insights, format_insights, risk_alerts, risk_message, academic_summary, format_academic_summary
+from metrics import (
+    ROLLING_WINDOWS, RISK_WINDOW_DAYS, calculate_metrics, metrics_from_totals, delivery_performance_breakdown,
+    daily_totals, latest_window_counts, purchase_days, rolling_from_daily, rolling_kpis
+)
+from ml_engine import anomaly_detection, anomaly_summary_from_counts
+from parallel import PartitionedBackend
+from preprocessing import DATE_COLUMNS, preprocess_data
+
+# Imported on first use so loading this module does not pull in duckdb
+DUCKDB_AVAILABLE = importlib.util.find_spec("duckdb") is not None
+
+ANALYTICS_BACKENDS = ("pandas", "sqlite", "duckdb", "parallel")
+
+# Rows per chunk when streaming the CSV into an SQL engine
+SQL_LOAD_CHUNK_ROWS = 100_000
+
+# Methods every backend implements, in the order the parity check runs them
+BACKEND_METHODS = (
+    "metrics",
+    "delivery_breakdown",
+    "order_status_distribution",
+    "monthly_trend",
+    "top_5_months",
+    "yearly_summary",
+    "insights",
+    "risk_alert",
+    "academic_summary",
+    "anomalies",
+    "rolling_kpis"
+)
+
+
+class PandasBackend:
+    """The default: the existing pandas functions over the loaded frame."""
+
+    name = "pandas"
+
+    def __init__(self, df):
+        self.df = df
+
+    def metrics(self):
+        return calculate_metrics(self.df)
+
+    def delivery_breakdown(self):
+        return delivery_performance_breakdown(self.df)
+
+    def order_status_distribution(self):
+        return get_order_status_distribution(self.df)
+
+    def monthly_trend(self):
+        return get_monthly_trend(self.df)
+
+    def top_5_months(self):
+        return get_top_5_months(self.df)
+
+    def yearly_summary(self):
+        return get_yearly_summary(self.df)
+
+    def insights(self):
+        return generate_insights(self.df)
+
+    def risk_alert(self):
+        return risk_alerts(self.df)
+
+    def academic_summary(self):
+        return academic_summary(self.df)
+
+    def anomalies(self):
+        return anomaly_detection(self.df)
+
+    def rolling_kpis(self, windows=ROLLING_WINDOWS):
+        return rolling_kpis(self.df, windows)
+
+    def close(self):
+        pass
+
+
+# ==============================
+# SQL backends
+# ==============================
+
+# Timestamps are stored as nullable int64 nanoseconds, so comparisons
+# (and NULL for NaT) behave exactly like the pandas datetime columns.
+_ORDERS_DDL = """
+CREATE TABLE orders (
+    order_status TEXT,
+    delivered BIGINT,
+    estimated BIGINT,
+    delivery_days DOUBLE,
+    purchase_year INTEGER,
+    purchase_month INTEGER,
+    purchase_day INTEGER
+)
+"""
+
+_LOAD_COLUMNS = ['order_status'] + DATE_COLUMNS
+
+# Bumped when the table layout changes, so persisted databases are rebuilt
+SQL_SCHEMA_VERSION = 2
+
+
+def _nanoseconds(series):
+    values = series.to_numpy(dtype="datetime64[ns]").view("int64")
+    return pd.arrays.IntegerArray(values, series.isna().to_numpy())
+
+
+def _sql_chunk(chunk):
+    """Preprocess one CSV chunk into the ``orders`` table layout."""
+    chunk = preprocess_data(chunk)
+    return pd.DataFrame({
+        "order_status": chunk['order_status'],
+        "delivered": _nanoseconds(chunk['order_delivered_customer_date']),
+        "estimated": _nanoseconds(chunk['order_estimated_delivery_date']),
+        "delivery_days": chunk['delivery_days'].astype(np.float64),
+        "purchase_year": chunk['purchase_year'].astype("Int64"),
+        "purchase_month": chunk['purchase_month'].astype("Int64"),
+        "purchase_day": pd.arrays.IntegerArray(purchase_days(chunk), chunk['order_purchase_timestamp'].isna().to_numpy())
+    })
+
+
+def iter_sql_chunks(csv_path, chunk_rows=SQL_LOAD_CHUNK_ROWS):
+    """Stream the CSV as preprocessed ``orders`` chunks without loading it whole."""
+    for chunk in pd.read_csv(csv_path, usecols=_LOAD_COLUMNS, chunksize=chunk_rows):
+        yield _sql_chunk(chunk)
+
+
+class SQLBackend:
+    """
+    Shared queries for the SQL engines. Subclasses provide ``_connect``,
+    ``_insert`` and ``_query``; results go through the same shaping
+    helpers as the pandas functions.
+    """
+
+    name = "sql"
+    placeholder = "?"
+
+    def __init__(self, csv_path, version, db_path=":memory:"):
+        self.csv_path = csv_path
+        self.version = version
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = self._connect()
+        if self._stored_version() != self._meta_version:
+            self._load()
+
+    # ------------------------------
+    # Loading
+    # ------------------------------
+
+    @property
+    def _meta_version(self):
+        return f"{self.version}/{SQL_SCHEMA_VERSION}"
+
+    def _stored_version(self):
+        """Dataset version a persistent database file was built from, if any."""
+        try:
+            rows = self._query("SELECT version FROM dataset_meta")
+        except Exception:
+            return None
+        return rows[0][0] if rows else None
+
+    def _load(self):
+        with self._lock:
+            for table in ("orders", "dataset_meta"):
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(_ORDERS_DDL)
+            for chunk in iter_sql_chunks(self.csv_path):
+                self._insert(chunk)
+            self._create_indexes()
+            self.conn.execute("CREATE TABLE dataset_meta (version TEXT)")
+            self.conn.execute(f"INSERT INTO dataset_meta VALUES ({self.placeholder})", [self._meta_version])
+            self.conn.commit()
+
+    def _create_indexes(self):
+        pass
+
+    # ------------------------------
+    # Queries
+    # ------------------------------
+
+    def _late_count(self):
+        return self._query("SELECT COUNT(*) FROM orders WHERE delivered > estimated")[0][0]
+
+    def _totals(self):
+        return self._query("SELECT COUNT(*), AVG(delivery_days) FROM orders")[0]
+
+    def _status_counts(self):
+        # Ties are broken by first appearance, like value_counts
+        return self._query(
+            "SELECT order_status, COUNT(*) FROM orders WHERE order_status IS NOT NULL "
+            "GROUP BY order_status ORDER BY COUNT(*) DESC, MIN(rowid)"
+        )
+
+    def _monthly_counts(self, order_by="purchase_year, purchase_month", limit=None):
+        sql = (
+            "SELECT purchase_year, purchase_month, COUNT(*) AS order_count FROM orders "
+            "WHERE purchase_year IS NOT NULL AND purchase_month IS NOT NULL "
+            f"GROUP BY purchase_year, purchase_month ORDER BY {order_by}"
+        )
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [
+            {"purchase_year": year, "purchase_month": month, "order_count": count}
+            for year, month, count in self._query(sql)
+        ]
+
+    def metrics(self):
+        total, avg_days = self._totals()
+        return metrics_from_totals(total, avg_days if total else 0.0, self._late_count())
+
+    def delivery_breakdown(self):
+        on_time, late = self._query(
+            "SELECT COUNT(*) FILTER (WHERE delivered <= estimated), "
+            "COUNT(*) FILTER (WHERE delivered > estimated) FROM orders"
+        )[0]
+        return {"on_time_deliveries": on_time, "late_deliveries": late}
+
+    def order_status_distribution(self):
+        return {status: count for status, count in self._status_counts()}
+
+    def monthly_trend(self):
+        return self._monthly_counts()
+
+    def top_5_months(self):
+        return self._monthly_counts(order_by="order_count DESC, purchase_year, purchase_month", limit=5)
+
+    def yearly_summary(self):
+        rows = self._query(
+            "SELECT purchase_year, COUNT(*) FROM orders WHERE purchase_year IS NOT NULL "
+            "GROUP BY purchase_year ORDER BY purchase_year"
+        )
+        return [{"purchase_year": year, "order_count": count} for year, count in rows]
+
+    def insights(self):
+        total, avg_days = self._totals()
+        if not total:
+            return format_insights(0, "unknown", 0.0)
+        counts = self._status_counts()
+        return format_insights(total, counts[0][0] if counts else None, avg_days)
+
+    def _daily_totals(self):
+        rows = self._query(
+            "SELECT purchase_day, COUNT(*), COUNT(*) FILTER (WHERE delivered > estimated), "
+            "COUNT(delivery_days), COALESCE(SUM(delivery_days), 0) FROM orders "
+            "WHERE purchase_day IS NOT NULL GROUP BY purchase_day ORDER BY purchase_day"
+        )
+        columns = list(zip(*rows)) or [[], [], [], [], []]
+        day, orders, late, delivered, days_sum = columns
+        return daily_totals(day, late, delivered, days_sum, orders=orders)
+
+    def rolling_kpis(self, windows=ROLLING_WINDOWS):
+        return rolling_from_daily(*self._daily_totals(), windows)
+
+    def risk_alert(self):
+        late, orders = latest_window_counts(*self._daily_totals(), RISK_WINDOW_DAYS)
+        return risk_message(late, orders, RISK_WINDOW_DAYS)
+
+    def academic_summary(self):
+        return format_academic_summary(self._totals()[0], self._late_count())
+
+    def anomalies(self):
+        rows = self._query(
+            "SELECT delivery_days, COUNT(*) FROM orders WHERE delivery_days IS NOT NULL "
+            "GROUP BY delivery_days ORDER BY delivery_days"
+        )
+        values = [value for value, _ in rows]
+        counts = [count for _, count in rows]
+        return anomaly_summary_from_counts(values, counts, self._totals()[0])
+
+
+class SQLiteBackend(SQLBackend):
+    """SQLite, in memory or in ``db_path``, with indexes on the grouping columns."""
+
+    name = "sqlite"
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _insert(self, chunk):
+        rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        self.conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _create_indexes(self):
+        self.conn.execute("CREATE INDEX idx_orders_status ON orders (order_status)")
+        self.conn.execute("CREATE INDEX idx_orders_month ON orders (purchase_year, purchase_month)")
+        self.conn.execute("ANALYZE")
+
+    def _query(self, sql):
+        # One connection shared by the request threads
+        with self._lock:
+            return self.conn.execute(sql).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+class DuckDBBackend(SQLBackend):
+    """DuckDB, in memory or in ``db_path``; each query runs on its own cursor."""
+
+    name = "duckdb"
+
+    def _connect(self):
+        if not DUCKDB_AVAILABLE:
+            raise RuntimeError("The duckdb backend requires duckdb. Install with: pip install duckdb")
+        import duckdb
+        return duckdb.connect(self.db_path)
+
+    def _insert(self, chunk):
+        self.conn.register("sql_chunk", chunk)
+        self.conn.execute("INSERT INTO orders SELECT * FROM sql_chunk")
+        self.conn.unregister("sql_chunk")
+
+    def _query(self, sql):
+        # DuckDB cursors are independent connections, so queries run concurrently
+        return self.conn.cursor().execute(sql).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def create_backend(name, df=None, csv_path=None, version=None, db_path=None):
+    """Build the backend called ``name`` for one dataset version."""
+    if name == "pandas":
+        return PandasBackend(df)
+    if name == "parallel":
+        return PartitionedBackend(df)
+    db_path = db_path or ":memory:"
+    if name == "sqlite":
+        return SQLiteBackend(str(csv_path), version, db_path)
+    if name == "duckdb":
+        return DuckDBBackend(str(csv_path), version, db_path)
+    raise ValueError(f"Unknown analytics backend: {name}. Expected one of {', '.join(ANALYTICS_BACKENDS)}")
+
+
+# ==============================
+# Backend parity
+# ==============================
+
+def check_backend_parity(reference, candidate):
+    """
+    Run every backend method on both backends and list the ones whose
+    results differ. An empty list means the backends agree exactly.
+    """
+    mismatches = []
+    for method in BACKEND_METHODS:
+        expected = getattr(reference, method)()
+        actual = getattr(candidate, method)()
+        if expected != actual:
+            mismatches.append({"method": method, reference.name: expected, candidate.name: actual})
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check SQL backends against the pandas backend.")
+    parser.add_argument("csv", help="orders CSV to load")
+    parser.add_argument("--backend", default="all", choices=("sqlite", "duckdb", "parallel", "all"))
+    args = parser.parse_args(argv)
+
+    from data_loader import load_data, dataset_fingerprint
+
+    reference = PandasBackend(preprocess_data(load_data(args.csv)))
+    version = dataset_fingerprint(args.csv)
+    names = ["sqlite", "duckdb", "parallel"] if args.backend == "all" else [args.backend]
+    if args.backend == "all" and not DUCKDB_AVAILABLE:
+        names.remove("duckdb")
+
+    failed = False
+    for name in names:
+        backend = create_backend(name, df=reference.df, csv_path=args.csv, version=version)
+        mismatches = check_backend_parity(reference, backend)
+        backend.close()
+        print(f"{name}: {'ok' if not mismatches else f'{len(mismatches)} mismatches'}")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        failed = failed or bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
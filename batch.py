@@ -0,0 +1,220 @@
+"""
+Headless batch analysis.
+
+Runs the same pipeline as the web app (load_data -> validate_data ->
+preprocess_data -> metrics, analysis, insights and ML insights) over
+every dataset file in a directory, one worker process per file, and
+writes a JSON result (and optionally the PDF report) per file. Progress
+is kept in ``manifest.json`` in the output directory, so an interrupted
+run resumes where it stopped. Flask is not imported.
+
+    python batch.py data/regions/ --output results/ --workers 8 --formats json,pdf
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from data_loader import load_data, dataset_fingerprint
+from preprocessing import validate_data, preprocess_data
+from analysis import get_top_5_months, get_yearly_summary
+from insights import risk_alerts, academic_summary
+from ml_engine import get_all_ml_insights
+from report_generator import report_inputs, render_report_bytes
+from serialization import dumps
+
+MANIFEST_NAME = "manifest.json"
+OUTPUT_FORMATS = ("json", "pdf")
+
+
+class _Timer:
+    """Per-stage wall-clock timings for one file."""
+
+    def __init__(self):
+        self.timings = {}
+
+    def run(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 4)
+
+
+def analyze_file(path, output_dir, formats=("json",), include_ml=True):
+    """
+    Run the full analysis for one dataset file and write its outputs.
+    Returns the manifest entry; failures are reported, not raised.
+    """
+    path = Path(path)
+    output_dir = Path(output_dir)
+    timer = _Timer()
+    entry = {"dataset_version": dataset_fingerprint(path), "outputs": {}}
+    started = time.perf_counter()
+
+    try:
+        df = timer.run("load", load_data, path)
+        timer.run("validate", validate_data, df)
+        df = timer.run("preprocess", preprocess_data, df)
+
+        # report_inputs holds the aggregates /report renders from
+        inputs = timer.run("aggregate", report_inputs, df)
+        result = {
+            "source": path.name,
+            "dataset_version": entry["dataset_version"],
+            "rows": int(len(df)),
+            "metrics": inputs["metrics"],
+            "delivery_breakdown": inputs["delivery"],
+            "order_status": inputs["status_dist"],
+            "monthly_trend": inputs["trends"],
+            "top_5_months": timer.run("top_months", get_top_5_months, df),
+            "yearly_summary": get_yearly_summary(df),
+            "insights": inputs["insights"],
+            "risk_alert": risk_alerts(df),
+            "summary": academic_summary(df) if len(df) else None
+        }
+        if include_ml:
+            result["ml_insights"] = timer.run("ml", get_all_ml_insights, df)
+
+        if "json" in formats:
+            json_path = output_dir / f"{path.stem}.json"
+            timer.run("write_json", json_path.write_bytes, dumps(result))
+            entry["outputs"]["json"] = json_path.name
+        if "pdf" in formats:
+            pdf_bytes = timer.run("render_pdf", render_report_bytes, inputs)
+            if pdf_bytes is None:
+                raise RuntimeError("PDF output requires reportlab. Install with: pip install reportlab")
+            pdf_path = output_dir / f"{path.stem}.pdf"
+            pdf_path.write_bytes(pdf_bytes)
+            entry["outputs"]["pdf"] = pdf_path.name
+
+        entry["status"] = "ok"
+        entry["rows"] = result["rows"]
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = f"{type(e).__name__}: {e}"
+
+    entry["timings"] = timer.timings
+    entry["seconds"] = round(time.perf_counter() - started, 4)
+    return entry
+
+
+# ==============================
+# Manifest
+# ==============================
+
+def load_manifest(output_dir):
+    path = Path(output_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {"files": {}}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def write_manifest(output_dir, manifest):
+    """Write the manifest atomically so an interrupted run never leaves it truncated."""
+    path = Path(output_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_done(entry, path, output_dir, formats=("json",)):
+    """
+    True when ``entry`` succeeded for the current version of ``path`` and
+    wrote every format in ``formats``, and those outputs still exist.
+    """
+    if not entry or entry.get("status") != "ok":
+        return False
+    if entry.get("dataset_version") != dataset_fingerprint(path):
+        return False
+    outputs = entry.get("outputs", {})
+    return all(fmt in outputs and (Path(output_dir) / outputs[fmt]).exists() for fmt in formats)
+
+
+def summarize(manifest, files, skipped, seconds):
+    entries = [manifest["files"].get(path.name, {}) for path in files]
+    return {
+        "total": len(files),
+        "ok": sum(entry.get("status") == "ok" for entry in entries),
+        "failed": sum(entry.get("status") == "failed" for entry in entries),
+        "skipped": skipped,
+        "seconds": round(seconds, 2),
+        "processed_rows": sum(entry.get("rows", 0) for entry in entries)
+    }
+
+
+def run_batch(input_dir, output_dir, pattern="*.csv", workers=None, formats=("json",), include_ml=True, force=False):
+    """Analyze every file matching ``pattern`` in ``input_dir``. Returns the manifest."""
+    started = time.perf_counter()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = sorted(Path(input_dir).glob(pattern))
+
+    manifest = {"files": {}} if force else load_manifest(output_dir)
+    manifest.update({"input_dir": str(Path(input_dir).resolve()), "pattern": pattern, "formats": list(formats)})
+    pending = [path for path in files if force or not is_done(manifest["files"].get(path.name), path, output_dir, formats)]
+    skipped = len(files) - len(pending)
+    if skipped:
+        print(f"Resuming: {skipped} of {len(files)} files already done")
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_file, path, output_dir, formats, include_ml): path for path in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory)
+                entry = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            entry["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            manifest["files"][path.name] = entry
+            write_manifest(output_dir, manifest)
+
+            done += 1
+            detail = entry.get("error") or f"{entry.get('rows', 0)} rows"
+            print(f"[{done}/{len(pending)}] {path.name} {entry['status']} {entry.get('seconds', 0):.2f}s ({detail})")
+
+    manifest["summary"] = summarize(manifest, files, skipped, time.perf_counter() - started)
+    write_manifest(output_dir, manifest)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the order analysis pipeline over a directory of datasets.")
+    parser.add_argument("input_dir", help="directory containing the order CSV files")
+    parser.add_argument("--output", default="batch_output", help="directory for results and manifest.json")
+    parser.add_argument("--pattern", default="*.csv", help="glob for dataset files (default: *.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--formats", default="json", help="comma separated outputs: json, pdf")
+    parser.add_argument("--skip-ml", action="store_true", help="skip the ML insights")
+    parser.add_argument("--force", action="store_true", help="reprocess files already in the manifest")
+    args = parser.parse_args(argv)
+
+    formats = tuple(name.strip() for name in args.formats.split(",") if name.strip())
+    unknown = [name for name in formats if name not in OUTPUT_FORMATS]
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(unknown)}")
+    if not Path(args.input_dir).is_dir():
+        parser.error(f"not a directory: {args.input_dir}")
+
+    manifest = run_batch(
+        args.input_dir, args.output, args.pattern, args.workers, formats,
+        include_ml=not args.skip_ml, force=args.force
+    )
+    summary = manifest["summary"]
+    print(
+        f"Done: {summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped "
+        f"in {summary['seconds']}s. Manifest: {Path(args.output) / MANIFEST_NAME}"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Result cache keyed by dataset version.
+
+Entries are stored as futures so concurrent requests for the same key
+share one computation, either run inline by the first caller (``get``)
+or on the background worker pool (``submit``).
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class VersionedCache:
+
+    def __init__(self, max_workers=2):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-worker")
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, version, key):
+        """Return (future, is_new) for the entry, creating a pending one on a miss."""
+        with self._lock:
+            future = self._entries.get((version, key))
+            if future is not None:
+                self.hits += 1
+                return future, False
+            self.misses += 1
+            future = Future()
+            self._entries[(version, key)] = future
+            return future, True
+
+    def _run(self, version, key, future, compute):
+        try:
+            result = compute()
+        except BaseException as e:
+            # Failed computations are not cached, the next request retries
+            with self._lock:
+                if self._entries.get((version, key)) is future:
+                    del self._entries[(version, key)]
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def get(self, version, key, compute):
+        """Return the cached value, computing it in the calling thread on a miss."""
+        future, is_new = self._lookup(version, key)
+        if is_new:
+            self._run(version, key, future, compute)
+        return future.result()
+
+    def submit(self, version, key, compute):
+        """Return a future for the value, computing it on the worker pool on a miss."""
+        future, is_new = self._lookup(version, key)
+        if is_new:
+            self._executor.submit(self._run, version, key, future, compute)
+        return future
+
+    def peek(self, version, key):
+        """Return the entry's future without computing anything, or None."""
+        with self._lock:
+            return self._entries.get((version, key))
+
+    def entries(self):
+        """((version, key), value) for every finished, successful entry."""
+        with self._lock:
+            items = list(self._entries.items())
+        return [
+            (entry_key, future.result())
+            for entry_key, future in items
+            if future.done() and not future.cancelled() and future.exception() is None
+        ]
+
+    def evict(self, entry_keys):
+        """Drop the given (version, key) entries. Callers holding their values keep them."""
+        with self._lock:
+            for entry_key in entry_keys:
+                self._entries.pop(entry_key, None)
+
+    def invalidate(self, keep_version=None):
+        """Drop every entry that does not belong to ``keep_version``."""
+        with self._lock:
+            for entry_key in list(self._entries):
+                if entry_key[0] != keep_version:
+                    del self._entries[entry_key]
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -7,15 +7,24 @@ import numpy as np
 from typing import List, Dict, Any
 import os
 import json
+import importlib.util
 
-# Import Google Generative AI
+from startup import lazy_import
+
+# Google Generative AI is only located here; it is imported on first use
 try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
+    GEMINI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
 except ImportError:
     GEMINI_AVAILABLE = False
 
 
+def _genai():
+    return lazy_import("google.generativeai")
+
+# Number of retrieved facts placed into each Gemini prompt
+RETRIEVAL_TOP_K = int(os.getenv("CHATBOT_TOP_K", "8"))
+
+
 def get_gemini_api_key() -> str:
     """Read and sanitize Gemini API key from environment."""
     api_key = os.getenv("GEMINI_API_KEY", "")
@@ -32,17 +41,19 @@ def initialize_gemini():
     if not api_key:
         return False
 
-    genai.configure(api_key=api_key)
+    _genai().configure(api_key=api_key)
     return True
 
 
-def analyze_data_with_ai(df: pd.DataFrame, question: str) -> str:
+def analyze_data_with_ai(df: pd.DataFrame, question: str, fact_index=None, get_correlations=None) -> str:
     """
     Analyze DataFrame and answer natural language questions using Google Gemini API
     
     Args:
         df: Pandas DataFrame to analyze
         question: User's natural language question
+        fact_index: Optional retrieval.FactIndex used to build a compact prompt
+        get_correlations: Optional callable returning cached ml_engine.compute_correlations output
         
     Returns:
         str: AI-generated answer from Gemini
@@ -51,11 +62,11 @@ def analyze_data_with_ai(df: pd.DataFrame, question: str) -> str:
     # Try Gemini API first
     if GEMINI_AVAILABLE and initialize_gemini():
         try:
-            return gemini_analysis(df, question)
+            return gemini_analysis(df, question, fact_index)
         except Exception as e:
             error_message = str(e)
             if "API_KEY_INVALID" in error_message or "API key not valid" in error_message:
-                fallback = intelligent_data_analysis(df, question)
+                fallback = intelligent_data_analysis(df, question, get_correlations)
                 return (
                     "Gemini API key is invalid. Update GEMINI_API_KEY in .env with a fresh key from "
                     "https://aistudio.google.com/app/apikey.\n\n"
@@ -64,16 +75,19 @@ def analyze_data_with_ai(df: pd.DataFrame, question: str) -> str:
             print(f"Gemini API error: {error_message}")
     
     # Fallback: Intelligent keyword-based analysis
-    return intelligent_data_analysis(df, question)
+    return intelligent_data_analysis(df, question, get_correlations)
 
 
-def gemini_analysis(df: pd.DataFrame, question: str) -> str:
+def gemini_analysis(df: pd.DataFrame, question: str, fact_index=None) -> str:
     """
     Use Google Gemini API to analyze data and answer questions
     """
     try:
-        # Prepare data summary for Gemini
-        data_summary = prepare_data_summary(df)
+        # Prepare data summary for Gemini: only the relevant facts when an index is available
+        if fact_index is not None and len(fact_index):
+            data_summary = prepare_retrieved_summary(fact_index, question)
+        else:
+            data_summary = prepare_data_summary(df)
         
         # Create the prompt for Gemini
         prompt = f"""You are a data analysis expert. I have a dataset with the following information:
@@ -95,7 +109,7 @@ Please provide a clear, concise answer based on the data. If the answer requires
         response = None
         for model_name in model_candidates:
             try:
-                model = genai.GenerativeModel(model_name)
+                model = _genai().GenerativeModel(model_name)
                 response = model.generate_content(prompt)
                 break
             except Exception as model_error:
@@ -132,7 +146,22 @@ Missing Values:
     return summary
 
 
-def intelligent_data_analysis(df: pd.DataFrame, question: str) -> str:
+def prepare_retrieved_summary(fact_index, question: str, top_k: int = RETRIEVAL_TOP_K) -> str:
+    """Prepare a compact summary from the facts most relevant to the question"""
+    facts = [fact for fact in fact_index.search(question, top_k=top_k) if fact["topic"] != "overview"]
+    summary = f"""
+{fact_index.overview()}
+
+Relevant facts:
+"""
+    if facts:
+        summary += "\n".join(f"- {fact['text']}" for fact in facts)
+    else:
+        summary += "- No precomputed facts matched this question."
+    return summary
+
+
+def intelligent_data_analysis(df: pd.DataFrame, question: str, get_correlations=None) -> str:
     """
     Intelligent fallback analysis using keyword matching and pandas operations
     """
@@ -174,7 +203,7 @@ def intelligent_data_analysis(df: pd.DataFrame, question: str) -> str:
     
     # QUERIES ABOUT CORRELATION/RELATIONSHIP
     if any(word in question_lower for word in ['relation', 'compare', 'relationship', 'correlation']):
-        return handle_relationship_query(df, question, info)
+        return handle_relationship_query(df, question, info, get_correlations)
     
     # DEFAULT: Summary statistics
     return generate_summary(df, info)
@@ -297,12 +326,11 @@ def handle_trend_query(df: pd.DataFrame, question: str, info: Dict) -> str:
         
         result = f"Trends over **{date_col}**:\n"
         
-        # Group by month if possible
-        df_copy = df.copy()
-        df_copy['month'] = pd.to_datetime(df_copy[date_col]).dt.to_period('M')
+        # Group by month if possible (by the key series, without copying the frame)
+        month = pd.to_datetime(df[date_col]).dt.to_period('M').rename('month')
         
         for col in numeric_cols[:3]:  # Show top 3 numeric columns
-            monthly = df_copy.groupby('month')[col].agg(['mean', 'count', 'sum'])
+            monthly = df[col].groupby(month).agg(['mean', 'count', 'sum'])
             result += f"\n**{col}**:\n"
             result += monthly.head().to_string()
         
@@ -332,7 +360,7 @@ def handle_distribution_query(df: pd.DataFrame, question: str, info: Dict) -> st
     return f"**{object_cols[0]}** Distribution:\n{dist.head(10).to_string()}"
 
 
-def handle_relationship_query(df: pd.DataFrame, question: str, info: Dict) -> str:
+def handle_relationship_query(df: pd.DataFrame, question: str, info: Dict, get_correlations=None) -> str:
     """Handle correlation/relationship queries"""
     numeric_cols = info['numeric_cols']
     
@@ -340,26 +368,16 @@ def handle_relationship_query(df: pd.DataFrame, question: str, info: Dict) -> st
         return "Need at least 2 numeric columns for correlation analysis."
     
     try:
-        corr_matrix = df[numeric_cols].corr()
+        # Strongest pairs come precomputed from the correlation engine
+        if get_correlations is not None:
+            correlations = get_correlations()
+        else:
+            from ml_engine import compute_correlations
+            correlations = compute_correlations(df, top_k=5)
         
-        # Find strongest correlations
         result = "**Strongest Correlations**:\n"
-        
-        # Get upper triangle
-        corr_pairs = []
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i+1, len(corr_matrix.columns)):
-                corr_pairs.append((
-                    corr_matrix.columns[i],
-                    corr_matrix.columns[j],
-                    corr_matrix.iloc[i, j]
-                ))
-        
-        # Sort by absolute value
-        corr_pairs.sort(key=lambda x: abs(x[2]), reverse=True)
-        
-        for col1, col2, corr in corr_pairs[:5]:
-            result += f"- **{col1}** ↔ **{col2}**: {corr:.3f}\n"
+        for pair in correlations["top_pairs"][:5]:
+            result += f"- **{pair['column_1']}** ↔ **{pair['column_2']}**: {pair['correlation']:.3f}\n"
         
         return result
     except Exception as e:
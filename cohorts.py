@@ -0,0 +1,159 @@
+"""
+Customer cohort and repeat-purchase analytics.
+
+Customers are bucketed by the month of their first order. Everything
+is computed from one sort of the orders by (customer code, purchase
+time): first orders, second orders and distinct (customer, month)
+pairs are then found by comparing each row with its predecessor, and
+the matrices are filled with bincount. There are no per-customer
+Python loops.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Columns of the retention matrix: months since the first order
+COHORT_MAX_MONTHS = 24
+
+# Buckets (upper bounds in days) for the time-to-second-order histogram
+SECOND_ORDER_BUCKETS = [7, 30, 90, 180, 365]
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+def customer_codes(df, catalog=None):
+    """
+    Integer customer code per order (-1 when unknown) and the key used.
+    Olist issues a new ``customer_id`` per order; when the customers table
+    is available its ``customer_unique_id`` identifies returning customers.
+    """
+    if catalog is not None and "customers" in catalog.paths:
+        codes, _ = pd.factorize(catalog.column("customers", "customer_unique_id"))
+        return catalog.take_codes("orders->customers", codes), "customer_unique_id"
+    codes, _ = pd.factorize(df['customer_id'])
+    return codes, "customer_id"
+
+
+def _month_label(key):
+    return f"{key // 12:04d}-{key % 12 + 1:02d}"
+
+
+def _matrix(values, observable):
+    """Nested lists for JSON, with None where the month is not observed yet."""
+    return [
+        [value if seen else None for value, seen in zip(row, seen_row)]
+        for row, seen_row in zip(values.tolist(), observable.tolist())
+    ]
+
+
+def cohort_analysis(df, codes, customer_key="customer_id", max_months=COHORT_MAX_MONTHS):
+    """
+    Retention and repeat-order matrices, time to second order and delivery
+    experience per first-purchase-month cohort.
+    """
+    purchase = df['order_purchase_timestamp']
+    valid = (np.asarray(codes) >= 0) & purchase.notna().to_numpy()
+    if not valid.any():
+        return {"customer_key": customer_key, "customers": 0, "cohorts": []}
+
+    customer = np.asarray(codes)[valid]
+    purchased = purchase.to_numpy(dtype="datetime64[ns]").view(np.int64)[valid]
+    month = (df['purchase_year'].to_numpy()[valid] * 12 + df['purchase_month'].to_numpy()[valid] - 1).astype(np.int64)
+    delivery_days = df['delivery_days'].to_numpy(dtype=np.float64)[valid]
+    late = (df['order_delivered_customer_date'] > df['order_estimated_delivery_date']).to_numpy()[valid]
+
+    # One sort: by customer, then purchase time
+    order = np.lexsort((purchased, customer))
+    customer, purchased, month = customer[order], purchased[order], month[order]
+    delivery_days, late = delivery_days[order], late[order]
+
+    is_first = np.r_[True, customer[1:] != customer[:-1]]
+    starts = np.flatnonzero(is_first)
+    customer_row = np.cumsum(is_first) - 1
+    rank = np.arange(len(customer)) - starts[customer_row]
+
+    # Cohort of every customer, then of every order
+    first_month = month[starts]
+    cohort_keys, customer_cohort = np.unique(first_month, return_inverse=True)
+    n_cohorts = len(cohort_keys)
+    cohort = customer_cohort[customer_row]
+    age = month - first_month[customer_row]
+
+    sizes = np.bincount(customer_cohort, minlength=n_cohorts)
+    orders_per_customer = np.diff(np.r_[starts, len(customer)])
+    repeat_customers = np.bincount(customer_cohort, weights=orders_per_customer > 1, minlength=n_cohorts)
+
+    # Retention: distinct customers ordering in each month since their first
+    months = max_months + 1
+    new_month = is_first | np.r_[True, month[1:] != month[:-1]]
+    in_range = age <= max_months
+    cell = cohort * months + age
+    active = np.bincount(cell[new_month & in_range], minlength=n_cohorts * months).reshape(n_cohorts, months)
+    orders = np.bincount(cell[in_range], minlength=n_cohorts * months).reshape(n_cohorts, months)
+    observable = np.arange(months)[None, :] <= (month.max() - cohort_keys)[:, None]
+
+    # Time between the first and second order
+    second = rank == 1
+    gap_days = (purchased[second] - purchased[starts[customer_row[second]]]) / NS_PER_DAY
+    bucket_edges = np.r_[SECOND_ORDER_BUCKETS, np.inf]
+    buckets = np.bincount(np.searchsorted(bucket_edges, gap_days, side='left'), minlength=len(bucket_edges))
+    labels = [f"<= {b} days" for b in SECOND_ORDER_BUCKETS] + [f"> {SECOND_ORDER_BUCKETS[-1]} days"]
+    cohort_gap_sum = np.bincount(cohort[second], weights=gap_days, minlength=n_cohorts)
+    cohort_gap_count = np.bincount(cohort[second], minlength=n_cohorts)
+
+    # Delivery experience of each cohort's orders, and repeat rate by first-order outcome
+    has_days = ~np.isnan(delivery_days)
+    delivered = np.bincount(cohort, weights=has_days, minlength=n_cohorts)
+    days_sum = np.bincount(cohort, weights=np.where(has_days, delivery_days, 0), minlength=n_cohorts)
+    cohort_orders = np.bincount(cohort, minlength=n_cohorts)
+    cohort_late = np.bincount(cohort, weights=late, minlength=n_cohorts)
+    first_late = late[starts]
+    repeated = orders_per_customer > 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = np.round(active / sizes[:, None] * 100, 2)
+        avg_days = np.round(days_sum / delivered, 2)
+        late_rate = np.round(cohort_late / cohort_orders * 100, 2)
+        avg_gap = np.round(cohort_gap_sum / cohort_gap_count, 1)
+
+    def rate(mask):
+        return round(float(repeated[mask].mean() * 100), 2) if mask.any() else None
+
+    def nullable(values):
+        return [None if value != value else value for value in values.tolist()]
+
+    return {
+        "customer_key": customer_key,
+        "customers": int(len(starts)),
+        "orders": int(len(customer)),
+        "cohorts": [_month_label(int(key)) for key in cohort_keys],
+        "months_since_first_order": list(range(months)),
+        "cohort_sizes": sizes.tolist(),
+        "retention": {
+            "active_customers": _matrix(active, observable),
+            "retention_percentage": _matrix(retention, observable),
+            "orders": _matrix(orders, observable)
+        },
+        "repeat": {
+            "repeat_customers": repeat_customers.astype(np.int64).tolist(),
+            "repeat_rate": nullable(np.round(repeat_customers / sizes * 100, 2)),
+            "overall_repeat_rate": round(float(repeated.mean() * 100), 2)
+        },
+        "second_order": {
+            "customers": int(second.sum()),
+            "median_days": round(float(np.median(gap_days)), 1) if len(gap_days) else None,
+            "mean_days": round(float(gap_days.mean()), 1) if len(gap_days) else None,
+            "percentiles": (
+                {f"p{q}": round(float(v), 1) for q, v in zip((25, 75, 90), np.percentile(gap_days, [25, 75, 90]))}
+                if len(gap_days) else {}
+            ),
+            "distribution": dict(zip(labels, buckets.tolist())),
+            "cohort_mean_days": nullable(avg_gap)
+        },
+        "delivery": {
+            "average_delivery_days": nullable(avg_days),
+            "late_delivery_percentage": nullable(late_rate),
+            "repeat_rate_after_late_first_order": rate(first_late),
+            "repeat_rate_after_first_order_not_late": rate(~first_late)
+        }
+    }
@@ -0,0 +1,98 @@
+"""
+Batched dashboard payload.
+
+Builds every section the frontend needs in one response. Sections are
+cached per dataset version and the encoded, compressed body is cached
+as well, so a repeat page load only costs a lookup (or a 304).
+"""
+
+import gzip
+import hashlib
+
+from analysis import get_order_status_distribution, get_monthly_trend
+from metrics import calculate_metrics, delivery_performance_breakdown
+from insights import generate_insights
+from preprocessing import data_quality_report
+from ml_engine import predict_future_orders, anomaly_detection, clustering_analysis
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Section name -> builder, in the order the dashboard renders them
+DASHBOARD_SECTIONS = {
+    "metrics": calculate_metrics,
+    "status": get_order_status_distribution,
+    "trend": get_monthly_trend,
+    "insights": lambda df: {"insight": generate_insights(df)},
+    "delivery": delivery_performance_breakdown,
+    "quality": data_quality_report,
+    "predictions": lambda df: predict_future_orders(df, months_ahead=6),
+    "anomalies": anomaly_detection,
+    "clustering": clustering_analysis
+}
+
+# Sections the analytics backend (ANALYTICS_BACKEND) computes; the rest use the frame
+BACKEND_SECTIONS = {
+    "metrics": lambda backend: backend.metrics(),
+    "status": lambda backend: backend.order_status_distribution(),
+    "trend": lambda backend: backend.monthly_trend(),
+    "insights": lambda backend: {"insight": backend.insights()},
+    "delivery": lambda backend: backend.delivery_breakdown()
+}
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+def parse_sections(raw):
+    """
+    Validate a comma separated ``sections`` parameter.
+    Returns (sections, unknown) with sections in canonical order.
+    """
+    if not raw:
+        return list(DASHBOARD_SECTIONS), []
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = sorted(requested - set(DASHBOARD_SECTIONS))
+    return [name for name in DASHBOARD_SECTIONS if name in requested], unknown
+
+
+def dashboard_etag(version, sections, encoding=None):
+    """
+    Strong ETag for a dataset version, section selection and content
+    encoding. Each encoding is its own representation, so it gets its own tag.
+    """
+    digest = hashlib.sha1(f"{version}:{','.join(sections)}:{encoding or 'identity'}".encode("utf-8")).hexdigest()[:16]
+    return f'"{digest}"'
+
+
+def choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None for identity."""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        if not part.strip():
+            continue
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+
+    if BROTLI_AVAILABLE and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
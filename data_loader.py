@@ -1,3 +1,4 @@
+import hashlib
 from pathlib import Path
 
 import pandas as pd
@@ -9,3 +10,11 @@ def load_data(file_path):
         raise FileNotFoundError(f"Dataset not found: {path}")
     df = pd.read_csv(path)
     return df
+
+
+def dataset_fingerprint(file_path):
+    """Short identifier of the dataset file version, based on path, size and mtime."""
+    path = Path(file_path).expanduser().resolve()
+    stat = path.stat()
+    raw = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,197 @@
+"""
+Holder for the loaded dataset.
+
+The store builds an immutable ``DatasetState`` (preprocessed frame,
+version and retrieval index) either synchronously or on a background
+thread, so the web app can accept connections before the data is ready.
+With ``watch`` it also polls the file and rebuilds a changed dataset in
+the background, swapping the new state in only once it is complete.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from data_loader import load_data, dataset_fingerprint
+from preprocessing import preprocess_data, validate_data
+from profiling import stage
+from retrieval import build_fact_index
+from startup import startup_phase
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetNotReady(RuntimeError):
+    """Raised when the dataset is requested before it finished loading."""
+
+
+class DatasetState:
+    """One loaded version of the dataset and everything derived from it."""
+
+    def __init__(self, df, version, fact_index, path):
+        self.df = df
+        self.version = version
+        self.fact_index = fact_index
+        self.path = path
+        self.loaded_at = time.time()
+
+
+def build_dataset_state(path):
+    """Load, validate and preprocess ``path`` and build its retrieval index."""
+    version = dataset_fingerprint(path)
+    with startup_phase("load"), stage("load"):
+        df = load_data(path)
+    with startup_phase("preprocess"), stage("preprocess"):
+        validate_data(df)
+        df = preprocess_data(df)
+    # Precomputed fact catalog the chatbot retrieves prompt context from
+    with startup_phase("fact_index"), stage("aggregate"):
+        fact_index = build_fact_index(df)
+    return DatasetState(df, version, fact_index, path)
+
+
+def file_signature(path):
+    """(size, mtime_ns) of ``path``, or None while it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DatasetStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.error = None
+        self.reload_error = None
+        self.reloads = 0
+        self._state = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._signature = None
+
+    def load(self):
+        """Build the dataset state in the calling thread."""
+        try:
+            self._signature = file_signature(self.path)
+            self._state = build_dataset_state(self.path)
+            self.error = None
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self._ready.set()
+        self._notify(None, self._state)
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.exception("Dataset load failed: %s", e)
+
+    def load_in_background(self):
+        """Start loading on a daemon thread and return immediately."""
+        self._thread = threading.Thread(target=self._load_quietly, daemon=True, name="dataset-loader")
+        self._thread.start()
+
+    @property
+    def ready(self):
+        return self._state is not None
+
+    def wait(self, timeout=None):
+        """Block until the first load attempt finished. Returns ``ready``."""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def current(self):
+        """The active ``DatasetState``; raises DatasetNotReady while loading."""
+        state = self._state
+        if state is None:
+            raise DatasetNotReady(str(self.error) if self.error else "Dataset is still loading")
+        return state
+
+    # ------------------------------
+    # Hot reload
+    # ------------------------------
+
+    def on_swap(self, listener):
+        """
+        Call ``listener(old_state, new_state)`` after every reload, and after
+        the first load (with ``old_state`` None) if it is registered before.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, old_state, new_state):
+        for listener in self._listeners:
+            try:
+                listener(old_state, new_state)
+            except Exception as e:
+                logger.exception("Dataset swap listener failed: %s", e)
+
+    def reload(self):
+        """
+        Rebuild the state from the file while the current one keeps serving,
+        then swap it in. Returns True when a new version was installed.
+        """
+        with self._reload_lock:
+            signature = file_signature(self.path)
+            try:
+                new_state = build_dataset_state(self.path)
+            except Exception as e:
+                self.reload_error = str(e)
+                logger.exception("Dataset reload failed, still serving the previous version: %s", e)
+                return False
+            if file_signature(self.path) != signature:
+                # Rewritten while loading; the next poll picks it up again
+                return False
+
+            old_state = self._state
+            self._state = new_state
+            self._signature = signature
+            self.error = None
+            self.reload_error = None
+            self.reloads += 1
+            self._ready.set()
+
+        self._notify(old_state, new_state)
+        return True
+
+    def _poll(self, interval):
+        pending = None
+        while not self._stop.wait(interval):
+            signature = file_signature(self.path)
+            if signature is None or signature == self._signature:
+                pending = None
+                continue
+            # Only reload once size and mtime held still for a full interval
+            if signature == pending:
+                self.reload()
+                pending = None
+            else:
+                pending = signature
+
+    def watch(self, interval=5.0):
+        """Poll the file's size and mtime every ``interval`` seconds and reload on change."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._poll, args=(interval,), daemon=True, name="dataset-watcher")
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def status(self):
+        state = self._state
+        if state is not None:
+            status = {"status": "ready", "version": state.version, "rows": int(len(state.df)), "reloads": self.reloads}
+            if self.reload_error:
+                status["reload_error"] = self.reload_error
+            return status
+        if self.error is not None:
+            return {"status": "failed", "error": str(self.error)}
+        return {"status": "loading"}
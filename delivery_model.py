@@ -0,0 +1,238 @@
+"""
+Per-order delivery-time model.
+
+Trains two gradient-boosted models on delivered orders: one for the
+number of delivery days, one for the probability of arriving after the
+estimated date. Training is offline; the fitted artifact is saved with
+the fingerprint of the dataset it was trained on and loaded by the web
+app, which only scores.
+
+    python delivery_model.py train [--data olist_orders_dataset.csv] [--output models/delivery_model.joblib]
+"""
+
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_data, dataset_fingerprint
+from preprocessing import DATE_COLUMNS, preprocess_data, validate_data
+from startup import lazy_import
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent / "models" / "delivery_model.joblib"
+MODEL_PATH = Path(os.getenv("DELIVERY_MODEL_PATH", str(DEFAULT_MODEL_PATH)))
+
+# Bumped when the feature layout changes; older artifacts are rejected
+ARTIFACT_FORMAT = 1
+
+FEATURES = [
+    "purchase_hour",
+    "purchase_weekday",
+    "purchase_month",
+    "approval_lag_hours",
+    "carrier_lag_hours",
+    "promised_days",
+    "order_status"
+]
+
+# Share of the most recent orders held out to evaluate the fitted models
+HOLDOUT_FRACTION = 0.2
+LATE_THRESHOLD = 0.5
+
+
+def _hours(later, earlier):
+    return (later - earlier).dt.total_seconds().to_numpy() / 3600
+
+
+def build_features(df, statuses):
+    """
+    Feature matrix from order timestamps and status. Missing timestamps
+    (e.g. not yet handed to the carrier) stay NaN; the models handle them.
+    """
+    purchase = df['order_purchase_timestamp']
+    status = pd.Categorical(df['order_status'], categories=statuses).codes.astype(np.float64)
+    status[status < 0] = np.nan
+
+    return np.column_stack([
+        purchase.dt.hour.to_numpy(dtype=np.float64, na_value=np.nan),
+        purchase.dt.dayofweek.to_numpy(dtype=np.float64, na_value=np.nan),
+        purchase.dt.month.to_numpy(dtype=np.float64, na_value=np.nan),
+        _hours(df['order_approved_at'], purchase),
+        _hours(df['order_delivered_carrier_date'], df['order_approved_at']),
+        _hours(df['order_estimated_delivery_date'], purchase) / 24,
+        status
+    ])
+
+
+def training_data(df):
+    """Delivered orders with their features, delivery days and late flags."""
+    delivered = df[df['delivery_days'].notna() & df['order_estimated_delivery_date'].notna()]
+    delivered = delivered.sort_values('order_purchase_timestamp', kind='stable')
+    statuses = sorted(df['order_status'].dropna().unique().tolist())
+
+    X = build_features(delivered, statuses)
+    days = delivered['delivery_days'].to_numpy(dtype=np.float64)
+    late = (delivered['order_delivered_customer_date'] > delivered['order_estimated_delivery_date']).to_numpy()
+    return X, days, late, statuses
+
+
+def train_delivery_model(df, dataset_version=None):
+    """
+    Fit the delivery-days regressor and late-delivery classifier.
+    The last HOLDOUT_FRACTION of orders (by purchase time) is used for the
+    reported metrics, then both models are refit on every delivered order.
+    """
+    ensemble = lazy_import('sklearn.ensemble')
+    sk_metrics = lazy_import('sklearn.metrics')
+
+    X, days, late, statuses = training_data(df)
+    if len(X) < 50:
+        raise ValueError("Not enough delivered orders to train the delivery model")
+    categorical = [name == "order_status" for name in FEATURES]
+
+    def regressor():
+        return ensemble.HistGradientBoostingRegressor(categorical_features=categorical, random_state=42)
+
+    def classifier():
+        return ensemble.HistGradientBoostingClassifier(categorical_features=categorical, random_state=42)
+
+    split = int(len(X) * (1 - HOLDOUT_FRACTION))
+    evaluation = {"train_rows": split, "holdout_rows": len(X) - split}
+    holdout_days = regressor().fit(X[:split], days[:split]).predict(X[split:])
+    evaluation["delivery_days_mae"] = round(float(sk_metrics.mean_absolute_error(days[split:], holdout_days)), 3)
+    if late[:split].any() and not late[:split].all():
+        holdout_late = classifier().fit(X[:split], late[:split]).predict_proba(X[split:])[:, 1]
+        evaluation["late_brier_score"] = round(float(sk_metrics.brier_score_loss(late[split:], holdout_late)), 4)
+        if late[split:].any() and not late[split:].all():
+            evaluation["late_roc_auc"] = round(float(sk_metrics.roc_auc_score(late[split:], holdout_late)), 4)
+
+    late_model = None
+    if late.any() and not late.all():
+        late_model = classifier().fit(X, late)
+
+    return {
+        "format": ARTIFACT_FORMAT,
+        "dataset_version": dataset_version,
+        "trained_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "rows": int(len(X)),
+        "features": FEATURES,
+        "statuses": statuses,
+        "late_rate": round(float(late.mean()), 4),
+        "evaluation": evaluation,
+        "days_model": regressor().fit(X, days),
+        "late_model": late_model
+    }
+
+
+def save_artifact(artifact, path=MODEL_PATH):
+    joblib = lazy_import('joblib')
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename, so a running app never loads a half-written file
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def artifact_summary(artifact):
+    """The artifact's metadata, without the fitted models."""
+    return {key: value for key, value in artifact.items() if key not in ("days_model", "late_model")}
+
+
+# ==============================
+# Scoring
+# ==============================
+
+class DeliveryModel:
+    """A trained artifact loaded for scoring."""
+
+    def __init__(self, artifact):
+        if artifact.get("format") != ARTIFACT_FORMAT:
+            raise ValueError("Delivery model artifact has an unsupported format; retrain it")
+        self.artifact = artifact
+        self.dataset_version = artifact["dataset_version"]
+
+    def score(self, orders, threshold=LATE_THRESHOLD):
+        """
+        Predicted delivery days and late probability for a DataFrame of
+        orders, in one vectorized call per model.
+        """
+        X = build_features(orders, self.artifact["statuses"])
+        days = self.artifact["days_model"].predict(X)
+        late_model = self.artifact["late_model"]
+        if late_model is not None:
+            late = late_model.predict_proba(X)[:, 1]
+        else:
+            late = np.full(len(X), self.artifact["late_rate"])
+
+        result = pd.DataFrame({
+            "predicted_delivery_days": np.round(days, 2),
+            "late_probability": np.round(late, 4),
+            "at_risk": late >= threshold
+        })
+        if 'order_id' in orders.columns:
+            result.insert(0, 'order_id', orders['order_id'].to_numpy())
+        return result
+
+
+def orders_frame(records):
+    """Parse a list of order dicts into the columns the model reads."""
+    orders = pd.DataFrame.from_records(records)
+    for col in DATE_COLUMNS + ['order_status']:
+        if col not in orders.columns:
+            orders[col] = None
+    for col in DATE_COLUMNS:
+        orders[col] = pd.to_datetime(orders[col], errors='coerce')
+    return orders
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load_model(path=MODEL_PATH):
+    """
+    The artifact at ``path``, loaded once and reloaded only when the file
+    changes. Returns None when no model has been trained.
+    """
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    with _load_lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            joblib = lazy_import('joblib')
+            _loaded[path] = (mtime, DeliveryModel(joblib.load(path)))
+        return _loaded[path][1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the per-order delivery model.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train = subcommands.add_parser("train", help="fit the models and save the artifact")
+    train.add_argument("--data", default=str(Path(__file__).resolve().parent / "olist_orders_dataset.csv"))
+    train.add_argument("--output", default=str(MODEL_PATH))
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    df = load_data(args.data)
+    validate_data(df)
+    df = preprocess_data(df)
+    artifact = train_delivery_model(df, dataset_fingerprint(args.data))
+    path = save_artifact(artifact, args.output)
+
+    summary = artifact_summary(artifact)
+    print(f"Trained on {summary['rows']} delivered orders in {time.perf_counter() - start:.1f}s")
+    print(f"Holdout: {summary['evaluation']}")
+    print(f"Saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Streaming exports of the dataset and aggregate tables.
+
+Every export is produced by a generator that encodes the frame in fixed
+size row chunks, so memory stays flat and the first bytes go out before
+the whole file is encoded.
+"""
+
+import io
+
+import pandas as pd
+
+from ml_engine import anomaly_records, cluster_assignments
+
+EXPORT_CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {
+    "csv": {"mimetype": "text/csv", "extension": "csv"},
+    "jsonl": {"mimetype": "application/x-ndjson", "extension": "jsonl"},
+    "parquet": {"mimetype": "application/vnd.apache.parquet", "extension": "parquet"}
+}
+
+EXPORT_TABLES = {
+    "orders": "Filtered, preprocessed order dataset",
+    "monthly-trend": "Order counts per purchase year and month",
+    "order-status": "Order counts per status",
+    "anomalies": "Orders with anomalous delivery times",
+    "clusters": "Per-order delivery cluster assignments"
+}
+
+
+def filter_mask(df, filters):
+    """
+    Boolean row mask for the supported export filters:
+    status, year, month, start and end (purchase timestamp bounds).
+    Returns None when no filter is set.
+    """
+    mask = None
+
+    def _and(condition):
+        return condition if mask is None else mask & condition
+
+    if filters.get("status"):
+        statuses = [s.strip() for s in filters["status"].split(",") if s.strip()]
+        mask = _and(df['order_status'].isin(statuses))
+    if filters.get("year"):
+        mask = _and(df['purchase_year'] == int(filters["year"]))
+    if filters.get("month"):
+        mask = _and(df['purchase_month'] == int(filters["month"]))
+    if filters.get("start"):
+        mask = _and(df['order_purchase_timestamp'] >= pd.Timestamp(filters["start"]))
+    if filters.get("end"):
+        mask = _and(df['order_purchase_timestamp'] < pd.Timestamp(filters["end"]))
+    return mask
+
+
+def iter_chunks(df, mask=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield row chunks of ``df``, applying ``mask`` one chunk at a time."""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        if mask is not None:
+            chunk = chunk[mask.iloc[start:start + chunk_rows].to_numpy()]
+        if len(chunk):
+            yield chunk
+
+
+def build_export_table(df, table, filters=None):
+    """
+    Return ``(frame, mask)`` for an export table.
+    Only the orders table is filtered lazily; aggregates are computed on the filtered rows.
+    """
+    mask = filter_mask(df, filters or {})
+    if table == "orders":
+        return df, mask
+
+    source = df if mask is None else df[mask.to_numpy()]
+    if table == "monthly-trend":
+        frame = source.groupby(['purchase_year', 'purchase_month']).size().reset_index(name='order_count')
+    elif table == "order-status":
+        frame = source['order_status'].value_counts().rename_axis('order_status').reset_index(name='order_count')
+    elif table == "anomalies":
+        frame = anomaly_records(source)
+    elif table == "clusters":
+        frame = cluster_assignments(source)
+    else:
+        raise ValueError(f"Unknown export table: {table}")
+    return frame, None
+
+
+def stream_csv(df, mask=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    yield ",".join(str(col) for col in df.columns) + "\n"
+    for chunk in iter_chunks(df, mask, chunk_rows):
+        yield chunk.to_csv(index=False, header=False)
+
+
+def stream_jsonl(df, mask=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    for chunk in iter_chunks(df, mask, chunk_rows):
+        # Each chunk already ends with a newline
+        yield chunk.to_json(orient="records", lines=True, date_format="iso")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands buffered bytes back to a generator."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_parquet(df, mask=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Write one parquet row group per chunk. Requires pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for chunk in iter_chunks(df, mask, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                # Schema comes from the first chunk, later chunks are cast to it
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            yield sink.drain()
+        if writer is None:
+            writer = pq.ParquetWriter(sink, pa.Schema.from_pandas(df.iloc[:0], preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "jsonl": stream_jsonl,
+    "parquet": stream_parquet
+}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def stream_export(df, table, fmt, filters=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Return a generator of encoded chunks for ``table`` in ``fmt``."""
+    if fmt not in STREAMERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    frame, mask = build_export_table(df, table, filters)
+    return STREAMERS[fmt](frame, mask, chunk_rows)
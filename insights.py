@@ -1,13 +1,22 @@
+from metrics import RISK_WINDOW_DAYS, latest_window_counts, order_daily_totals
+
+
 def generate_insights(df):
     total_orders = int(df.shape[0])
     if total_orders:
         most_common_status = df['order_status'].value_counts().idxmax()
         avg_delivery_raw = df['delivery_days'].mean()
-        avg_delivery = round(avg_delivery_raw, 2)
-        if avg_delivery != avg_delivery:
-            avg_delivery = 0.0
     else:
         most_common_status = "unknown"
+        avg_delivery_raw = 0.0
+
+    return format_insights(total_orders, most_common_status, avg_delivery_raw)
+
+
+def format_insights(total_orders, most_common_status, avg_delivery_raw):
+    """Insight text from raw totals (shared by every backend)."""
+    avg_delivery = round(avg_delivery_raw, 2) if avg_delivery_raw is not None else 0.0
+    if avg_delivery != avg_delivery:
         avg_delivery = 0.0
 
     insight_text = f"""
@@ -22,25 +31,27 @@ def generate_insights(df):
 # Viswakailash - Risk Alert Logic
 # ==============================
 
-def risk_alerts(df):
+def risk_alerts(df, window_days=RISK_WINDOW_DAYS):
+    """Delivery risk over the latest ``window_days`` days of orders, not the whole history."""
 
-    late_orders = df[
-        df['order_delivered_customer_date'] >
-        df['order_estimated_delivery_date']
-    ].shape[0]
+    late_orders, total_orders = latest_window_counts(*order_daily_totals(df), window_days)
+    return risk_message(late_orders, total_orders, window_days)
 
-    total_orders = int(df.shape[0])
+
+def risk_message(late_orders, total_orders, window_days=None):
+    """Risk level text for a late/total order count."""
+    period = f" in the latest {window_days} days" if window_days else ""
     if not total_orders:
-        return "No orders available to assess delivery risk."
+        return f"No orders{period} to assess delivery risk."
 
     late_ratio = late_orders / total_orders
 
     if late_ratio > 0.25:
-        return "High risk detected: Late deliveries exceed 25%."
+        return f"High risk detected: Late deliveries exceed 25%{period}."
     elif late_ratio > 0.15:
-        return "Moderate risk: Delivery delays increasing."
+        return f"Moderate risk: Delivery delays increasing{period}."
     else:
-        return "Delivery performance is stable."
+        return f"Delivery performance is stable{period}."
 # ==============================
 # Viswakailash - Academic Executive Summary
 # ==============================
@@ -53,6 +64,10 @@ def academic_summary(df):
         df['order_estimated_delivery_date']
     ].shape[0]
 
+    return format_academic_summary(total_orders, late_orders)
+
+
+def format_academic_summary(total_orders, late_orders):
     late_ratio = round((late_orders / total_orders) * 100, 2)
 
     return (
@@ -0,0 +1,165 @@
+"""
+Server-sent dashboard updates.
+
+When the dataset version changes, the dashboard sections of the new
+version are computed once, diffed against the previous version and the
+encoded event is handed to every connected stream. Subscribers only
+hold a small queue of pre-encoded events, so N open dashboards cost one
+computation and N queue puts. A subscriber that falls too far behind is
+disconnected; its browser reconnects and resyncs.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before it is considered too slow
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "16"))
+# Seconds between keep-alive comments on an idle stream
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+_CLOSED = object()
+
+
+def format_event(event, data, event_id=None):
+    """One event in the text/event-stream format, encoded."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _plain(value):
+    """JSON-equivalent value, so NumPy scalars and NaN compare like the client sees them."""
+    return json.loads(dumps(value))
+
+
+def section_diff(old, new):
+    """
+    Changes from ``old`` to ``new`` sections. Dict sections send the keys
+    that changed (``set``) or disappeared (``unset``); anything else is
+    sent whole (``replace``). Unchanged sections are left out.
+    """
+    diff = {}
+    for name, value in new.items():
+        value = _plain(value)
+        previous = _plain(old[name]) if name in old else None
+        if value == previous:
+            continue
+        if isinstance(value, dict) and isinstance(previous, dict):
+            diff[name] = {
+                "set": {key: item for key, item in value.items() if key not in previous or previous[key] != item},
+                "unset": [key for key in previous if key not in value]
+            }
+        else:
+            diff[name] = {"replace": value}
+    return diff
+
+
+class Subscriber:
+    """One open event stream."""
+
+    def __init__(self):
+        self.events = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+
+
+class EventHub:
+    """Fans encoded events out to every subscriber."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data, event_id=None):
+        """Encode the event once and queue it for every subscriber."""
+        payload = format_event(event, data, event_id)
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.events.put_nowait(payload)
+            except queue.Full:
+                # Too slow to keep up: end its stream, the client reconnects and resyncs
+                self.unsubscribe(subscriber)
+                self.dropped += 1
+                try:
+                    subscriber.events.get_nowait()
+                    subscriber.events.put_nowait(_CLOSED)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def stream(self, subscriber, first_events=(), heartbeat=SSE_HEARTBEAT_SECONDS):
+        """Generator of encoded events for one subscriber, ending when it is dropped."""
+        try:
+            yield b"retry: 3000\n\n"
+            for payload in first_events:
+                yield payload
+            while True:
+                try:
+                    payload = subscriber.events.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+                    continue
+                if payload is _CLOSED:
+                    return
+                yield payload
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {"subscribers": self.subscribers, "published": self.published, "dropped": self.dropped}
+
+
+def version_change_listener(hub, sections_for):
+    """
+    ``DatasetStore.on_swap`` listener that publishes a ``diff`` event.
+    ``sections_for(state)`` returns the dashboard sections of a dataset
+    state; it should go through the version cache, so the old sections
+    are usually already computed and the new ones are reused by
+    ``/dashboard``. Nothing is computed while nobody is subscribed.
+    """
+    def listener(old_state, new_state):
+        if not hub.subscribers:
+            return
+        try:
+            old = sections_for(old_state) if old_state is not None else {}
+            new = sections_for(new_state)
+            changes = section_diff(old, new)
+        except Exception as e:
+            # Clients can still resync from /dashboard
+            logger.exception("Live update failed: %s", e)
+            hub.publish("resync", {"version": new_state.version}, new_state.version)
+            return
+        hub.publish("diff", {
+            "version": new_state.version,
+            "previous_version": old_state.version if old_state is not None else None,
+            "rows": int(len(new_state.df)),
+            "sections": changes
+        }, new_state.version)
+
+    return listener
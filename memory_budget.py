@@ -0,0 +1,352 @@
+"""
+Memory accounting against a configured budget.
+
+The process resident set plus the working sets reserved by in-flight
+heavy requests is compared with the budget (``MEMORY_BUDGET_MB``, or the
+cgroup / physical memory limit). Above the soft threshold the largest
+cache entries are evicted and the routes that can switch to sampled
+answers do so. The hard threshold is compared with what is accounted
+for (dataset, cache and reservations), which shrinks as requests finish
+and entries are evicted; above it new heavy requests are turned away
+with 503 before they can allocate anything, unless they can be answered
+from the sample.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+MEMORY_SOFT_FRACTION = float(os.getenv("MEMORY_SOFT_FRACTION", "0.8"))
+MEMORY_HARD_FRACTION = float(os.getenv("MEMORY_HARD_FRACTION", "0.92"))
+# Working set reserved for a heavy request until one has been observed, as a share of the dataset size
+HEAVY_WORKING_SET_FRACTION = float(os.getenv("MEMORY_HEAVY_WORKING_SET_FRACTION", "0.5"))
+# Seconds between pressure checks
+MEMORY_CHECK_INTERVAL = float(os.getenv("MEMORY_CHECK_INTERVAL", "0.5"))
+# Retry-After for heavy requests rejected under memory pressure
+MEMORY_RETRY_AFTER_SECONDS = float(os.getenv("MEMORY_RETRY_AFTER_SECONDS", "10"))
+
+# Cheap to keep and reused by many routes: the approximate-mode sample, the
+# analytics backend and the table catalog are never evicted
+PROTECTED_KEYS = ("approx:sample", "backend:", "olist-catalog")
+
+# Heavy routes that answer from the sample under pressure, and the modes that ask for it
+SAMPLED_FALLBACK_ENDPOINTS = {"clustering", "anomalies", "data_quality"}
+SAMPLE_MODES = {"approx", "sampled"}
+
+
+def current_rss_bytes():
+    """Resident set size of the process now, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def detect_memory_limit():
+    """``MEMORY_BUDGET_MB``, else the cgroup limit, else 80% of physical memory."""
+    configured = os.getenv("MEMORY_BUDGET_MB")
+    if configured:
+        return int(float(configured) * 1024 * 1024)
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as handle:
+                value = handle.read().strip()
+        except OSError:
+            continue
+        # "max" or a huge sentinel means no limit
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    try:
+        return int(os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") * 0.8)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_size(value, depth=3):
+    """
+    Approximate bytes held by a cached value: exact for arrays, frames and
+    bytes, sampled for long lists, one attribute level for other objects.
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(index=True, deep=False)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if depth <= 0:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, depth - 1) + estimate_size(v, depth - 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        sample = items[:100]
+        per_item = sum(estimate_size(item, depth - 1) for item in sample) / len(sample) if sample else 0
+        return sys.getsizeof(value) + int(per_item * len(items))
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + sum(estimate_size(v, depth - 1) for v in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class MemoryBudget:
+    """Tracks memory use against the budget and decides how to degrade."""
+
+    def __init__(self, cache, dataset_state, limit=None, soft=MEMORY_SOFT_FRACTION, hard=MEMORY_HARD_FRACTION):
+        self.cache = cache
+        # Callable returning the active DatasetState, or None while loading
+        self.dataset_state = dataset_state
+        self.limit = limit if limit is not None else detect_memory_limit()
+        self.soft = soft
+        self.hard = hard
+        self.level = "ok"
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.degraded_responses = 0
+        self.rejections = 0
+        self._reserved = {}
+        self._observed = {}
+        self._sizes = {}
+        # Cache size when an eviction last failed to lower RSS; no new eviction until it grows back
+        self._futile_at = None
+        self._dataset_bytes = (None, 0)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    # ------------------------------
+    # Accounting
+    # ------------------------------
+
+    def dataset_bytes(self):
+        state = self.dataset_state()
+        if state is None:
+            return 0
+        version, size = self._dataset_bytes
+        if version != state.version:
+            size = int(state.df.memory_usage(index=True, deep=True).sum())
+            self._dataset_bytes = (state.version, size)
+        return size
+
+    def cache_sizes(self):
+        """
+        Estimated bytes per cache entry. Values never change, so estimates
+        are kept; the kept dict is only ever replaced, never changed, so
+        concurrent callers (requests, the metrics scrape) can share it.
+        """
+        known = self._sizes
+        sizes = {}
+        for entry_key, value in self.cache.entries():
+            size = known.get(entry_key)
+            sizes[entry_key] = size if size is not None else estimate_size(value)
+        self._sizes = sizes
+        return dict(sizes)
+
+    def evictable_sizes(self):
+        return {
+            entry_key: size for entry_key, size in self.cache_sizes().items()
+            if not entry_key[1].startswith(PROTECTED_KEYS)
+        }
+
+    def working_set(self, endpoint):
+        """Bytes to reserve for a heavy request: a decaying maximum of the growth seen for it, or a share of the dataset."""
+        observed = self._observed.get(endpoint)
+        return observed if observed is not None else int(self.dataset_bytes() * HEAVY_WORKING_SET_FRACTION)
+
+    def reserve(self, endpoint):
+        token = object()
+        with self._lock:
+            self._reserved[token] = (endpoint, self.working_set(endpoint), current_rss_bytes())
+        return token
+
+    def release(self, token):
+        with self._lock:
+            endpoint, _, rss_before = self._reserved.pop(token, (None, 0, None))
+        rss_after = current_rss_bytes()
+        if endpoint is not None and rss_before is not None and rss_after is not None:
+            # Growth while the request ran; concurrent requests make this an upper bound
+            growth = max(0, rss_after - rss_before)
+            self._observed[endpoint] = max(growth, int(self._observed.get(endpoint, 0) * 0.9))
+
+    def reserved_bytes(self):
+        with self._lock:
+            return sum(size for _, size, _ in self._reserved.values())
+
+    def accounted_bytes(self, cache_bytes=None):
+        """Dataset, cache and reservations: what the budget can free or refuse."""
+        if cache_bytes is None:
+            cache_bytes = sum(self.cache_sizes().values())
+        return self.dataset_bytes() + cache_bytes + self.reserved_bytes()
+
+    def used_bytes(self, cache_bytes=None):
+        rss = current_rss_bytes()
+        if rss is None:
+            # No /proc: fall back to what is accounted for
+            return self.accounted_bytes(cache_bytes)
+        return rss + self.reserved_bytes()
+
+    def _level_for(self, used, accounted):
+        if not self.limit:
+            return "ok"
+        if accounted >= self.limit * self.hard:
+            return "critical"
+        if used >= self.limit * self.soft:
+            return "high"
+        return "ok"
+
+    # ------------------------------
+    # Degradation
+    # ------------------------------
+
+    def check(self, force=False):
+        """Re-evaluate the pressure level (at most every MEMORY_CHECK_INTERVAL), evicting if needed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < MEMORY_CHECK_INTERVAL:
+            return self.level
+        if not self._check_lock.acquire(blocking=False):
+            # Another thread is checking; use its last answer
+            return self.level
+        try:
+            self._checked_at = now
+            used = self.used_bytes()
+            if self.limit and used >= self.limit * self.soft:
+                self._relieve(used - self.limit * self.soft)
+                used = self.used_bytes()
+            else:
+                self._futile_at = None
+            self.level = self._level_for(used, self.accounted_bytes())
+            return self.level
+        finally:
+            self._check_lock.release()
+
+    def _relieve(self, excess):
+        """
+        Evict up to ``excess`` bytes of the cache. When RSS does not fall
+        after an eviction, the pressure is not the cache's, and nothing more
+        is evicted until the cache has grown back to its size at that time.
+        """
+        cache_bytes = sum(self.evictable_sizes().values())
+        if self._futile_at is not None and cache_bytes < self._futile_at:
+            return 0
+        rss_before = current_rss_bytes()
+        freed = self.evict(min(excess, cache_bytes))
+        rss_after = current_rss_bytes()
+        if freed and rss_before is not None and rss_after is not None and rss_before - rss_after < freed * 0.1:
+            self._futile_at = cache_bytes
+        else:
+            self._futile_at = None
+        return freed
+
+    def evict(self, target_bytes):
+        """
+        Drop the largest unprotected cache entries until about ``target_bytes``
+        are freed. Returns the bytes dropped.
+        """
+        freed = 0
+        chosen = []
+        for entry_key, size in sorted(self.evictable_sizes().items(), key=lambda item: -item[1]):
+            if freed >= target_bytes:
+                break
+            chosen.append(entry_key)
+            freed += size
+        if chosen:
+            self.cache.evict(chosen)
+            self.evictions += len(chosen)
+            self.evicted_bytes += freed
+        return freed
+
+    @property
+    def degraded(self):
+        """True while heavy routes should answer from samples."""
+        return self.level != "ok"
+
+    def answers_from_sample(self, endpoint, mode):
+        """True when a request will be served from the sample rather than the full dataset."""
+        return endpoint in SAMPLED_FALLBACK_ENDPOINTS and (mode in SAMPLE_MODES or (mode is None and self.degraded))
+
+    def admit(self, endpoint):
+        """``(reason, retry_after)`` to turn a heavy request away, or None to admit it."""
+        level = self.check()
+        if level == "critical" or (
+            self.limit and self.accounted_bytes() + self.working_set(endpoint) >= self.limit * self.hard
+        ):
+            self.rejections += 1
+            return "memory_pressure", max(1, math.ceil(MEMORY_RETRY_AFTER_SECONDS))
+        return None
+
+    def report(self):
+        """Everything the diagnostics endpoint shows."""
+        sizes = self.cache_sizes()
+        cache_bytes = sum(sizes.values())
+        largest = sorted(sizes.items(), key=lambda item: -item[1])[:10]
+        with self._lock:
+            in_flight = [{"endpoint": endpoint, "reserved_bytes": size} for endpoint, size, _ in self._reserved.values()]
+        return {
+            "level": self.check(force=True),
+            "budget_bytes": self.limit,
+            "soft_limit_bytes": int(self.limit * self.soft) if self.limit else None,
+            "hard_limit_bytes": int(self.limit * self.hard) if self.limit else None,
+            "used_bytes": self.used_bytes(cache_bytes),
+            "accounted_bytes": self.accounted_bytes(cache_bytes),
+            "rss_bytes": current_rss_bytes(),
+            "dataset_bytes": self.dataset_bytes(),
+            "cache": {
+                "entries": len(sizes),
+                "bytes": cache_bytes,
+                "protected_bytes": cache_bytes - sum(self.evictable_sizes().values()),
+                "eviction_paused": self._futile_at is not None,
+                "largest": [{"version": version, "key": key, "bytes": size} for (version, key), size in largest]
+            },
+            "requests": {
+                "in_flight": in_flight,
+                "reserved_bytes": sum(item["reserved_bytes"] for item in in_flight),
+                "observed_working_set_bytes": dict(self._observed)
+            },
+            "actions": {
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "degraded_responses": self.degraded_responses,
+                "rejected_heavy_requests": self.rejections
+            }
+        }
+
+
+def init_app(app, budget, scheduler):
+    """Check the budget on every request and reserve working sets for heavy ones."""
+    from flask import g, request
+
+    def sampled():
+        return budget.answers_from_sample(request.endpoint, request.args.get("mode"))
+
+    def gate(class_name, endpoint):
+        # Sampled answers need little memory, so they are served even at the hard limit
+        if class_name != "heavy" or sampled():
+            return None
+        return budget.admit(endpoint)
+
+    scheduler.add_gate(gate)
+
+    @app.before_request
+    def _reserve_working_set():
+        budget.check()
+        if scheduler.classify(request.endpoint) == "heavy" and not sampled():
+            g.memory_reservation = budget.reserve(request.endpoint)
+
+    @app.after_request
+    def _mark_pressure(response):
+        if budget.degraded:
+            response.headers["X-Memory-Pressure"] = budget.level
+        return response
+
+    @app.teardown_request
+    def _release_working_set(error=None):
+        token = g.pop("memory_reservation", None)
+        if token is not None:
+            budget.release(token)
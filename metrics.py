@@ -1,16 +1,25 @@
+import numpy as np
+
+
 def calculate_metrics(df):
     total_orders = int(df.shape[0])
 
     avg_delivery_raw = df['delivery_days'].mean() if total_orders else 0.0
-    avg_delivery = round(avg_delivery_raw, 2)
-    if avg_delivery != avg_delivery:
-        avg_delivery = 0.0
 
     late_deliveries = df[
         df['order_delivered_customer_date'] >
         df['order_estimated_delivery_date']
     ].shape[0]
 
+    return metrics_from_totals(total_orders, avg_delivery_raw, late_deliveries)
+
+
+def metrics_from_totals(total_orders, avg_delivery_raw, late_deliveries):
+    """Shape the headline metrics from raw totals (shared by every backend)."""
+    avg_delivery = round(avg_delivery_raw, 2) if avg_delivery_raw is not None else 0.0
+    if avg_delivery != avg_delivery:
+        avg_delivery = 0.0
+
     late_percentage = 0.0
     if total_orders:
         late_percentage = round((late_deliveries / total_orders) * 100, 2)
@@ -40,3 +49,103 @@ def delivery_performance_breakdown(df):
         "on_time_deliveries": on_time,
         "late_deliveries": late
     }
+
+# ==============================
+# Rolling-Window KPIs
+# ==============================
+
+ROLLING_WINDOWS = (7, 30, 90)
+# Window the risk alert is evaluated on
+RISK_WINDOW_DAYS = 30
+
+DAILY_FIELDS = ("orders", "late", "delivered", "days_sum")
+
+
+def purchase_days(df):
+    """Purchase date of every order as days since 1970-01-01 (NaT becomes -1)."""
+    purchase = df['order_purchase_timestamp']
+    days = purchase.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+    days[purchase.isna().to_numpy()] = -1
+    return days
+
+
+def daily_totals(day, late, delivered, days_sum, orders=None):
+    """
+    Dense per-day totals from per-order rows (or per-day rows with their
+    ``orders`` counts). ``day`` is days since epoch, -1 for unknown.
+    Returns (first_day, {field: array}) covering first_day..last_day.
+    """
+    day = np.asarray(day, dtype=np.int64)
+    keep = day >= 0
+    if not keep.any():
+        return None, {field: np.zeros(0) for field in DAILY_FIELDS}
+
+    first_day = int(day[keep].min())
+    index = day[keep] - first_day
+    n_days = int(index.max()) + 1
+
+    def per_day(values):
+        weights = None if values is None else np.asarray(values, dtype=np.float64)[keep]
+        return np.bincount(index, weights=weights, minlength=n_days).astype(np.float64)
+
+    return first_day, {
+        "orders": per_day(orders),
+        "late": per_day(late),
+        "delivered": per_day(delivered),
+        "days_sum": per_day(days_sum)
+    }
+
+
+def _rounded_list(values):
+    return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+
+def rolling_from_daily(first_day, totals, windows=ROLLING_WINDOWS):
+    """
+    Trailing-window order volume, late-delivery rate and average delivery
+    days for every day, from one prefix sum per field: each window total is
+    ``prefix[end] - prefix[end - w]``, so the cost is O(days) per window.
+    """
+    n_days = len(totals["orders"])
+    prefix = {field: np.concatenate([[0.0], np.cumsum(totals[field])]) for field in DAILY_FIELDS}
+    end = np.arange(1, n_days + 1)
+
+    series = {}
+    latest = {}
+    for window in windows:
+        start = np.maximum(end - window, 0)
+        sums = {field: prefix[field][end] - prefix[field][start] for field in DAILY_FIELDS}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            late_rate = np.where(sums["orders"] > 0, sums["late"] / sums["orders"] * 100, np.nan)
+            avg_days = np.where(sums["delivered"] > 0, sums["days_sum"] / sums["delivered"], np.nan)
+
+        name = f"{window}d"
+        series[name] = {
+            "orders": sums["orders"].astype(np.int64).tolist(),
+            "late_delivery_percentage": _rounded_list(late_rate),
+            "average_delivery_days": _rounded_list(avg_days)
+        }
+        latest[name] = {key: values[-1] if values else None for key, values in series[name].items()}
+
+    dates = []
+    if first_day is not None:
+        dates = (np.arange(n_days) + first_day).astype("datetime64[D]").astype(str).tolist()
+    return {"windows": list(windows), "dates": dates, "series": series, "latest": latest}
+
+
+def order_daily_totals(df):
+    """daily_totals for the orders in ``df``."""
+    delivery_days = df['delivery_days'].to_numpy(dtype=np.float64)
+    has_days = ~np.isnan(delivery_days)
+    late = (df['order_delivered_customer_date'] > df['order_estimated_delivery_date']).to_numpy()
+    return daily_totals(purchase_days(df), late, has_days, np.where(has_days, delivery_days, 0))
+
+
+def rolling_kpis(df, windows=ROLLING_WINDOWS):
+    """Rolling 7/30/90-day KPIs for every purchase day."""
+    return rolling_from_daily(*order_daily_totals(df), windows)
+
+
+def latest_window_counts(first_day, totals, window_days=RISK_WINDOW_DAYS):
+    """(late, orders) over the last ``window_days`` days of the data."""
+    return int(totals["late"][-window_days:].sum()), int(totals["orders"][-window_days:].sum())
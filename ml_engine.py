@@ -1,9 +1,19 @@
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
 import warnings
-warnings.filterwarnings('ignore')
+from contextlib import contextmanager
+
+from startup import lazy_import
+
+# sklearn is imported on first use so importing this module stays cheap
+
+
+@contextmanager
+def _quiet():
+    """Silence sklearn/numpy warnings for the duration of a model fit."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
 
 def predict_future_orders(df, months_ahead=6):
     """
@@ -23,12 +33,14 @@ def predict_future_orders(df, months_ahead=6):
         y = monthly['order_count'].values
         
         # Train model
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Predict
-        future_indices = np.array([[len(monthly) + i] for i in range(1, months_ahead + 1)])
-        predictions = model.predict(future_indices)
+        LinearRegression = lazy_import('sklearn.linear_model').LinearRegression
+        with _quiet():
+            model = LinearRegression()
+            model.fit(X, y)
+            
+            # Predict
+            future_indices = np.array([[len(monthly) + i] for i in range(1, months_ahead + 1)])
+            predictions = model.predict(future_indices)
         
         # Format results
         last_year, last_month = monthly.iloc[-1][['purchase_year', 'purchase_month']].astype(int)
@@ -56,28 +68,42 @@ def predict_future_orders(df, months_ahead=6):
     except Exception as e:
         return {"error": str(e)}
 
+def _clustering_features(df):
+    """Delivery days and days since the first purchase, without missing values."""
+    purchase = df['order_purchase_timestamp']
+    features = pd.DataFrame({
+        'delivery_days': df['delivery_days'],
+        'days_since_start': (purchase - purchase.min()).dt.days
+    }, index=df.index)
+    return features.dropna()
+
+def _fit_clusters(features):
+    """Fit KMeans on the scaled features and return (model, labels)."""
+    KMeans = lazy_import('sklearn.cluster').KMeans
+    StandardScaler = lazy_import('sklearn.preprocessing').StandardScaler
+    
+    with _quiet():
+        # Normalize
+        scaler = StandardScaler()
+        features_scaled = scaler.fit_transform(features)
+        
+        # Cluster
+        kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
+        clusters = kmeans.fit_predict(features_scaled)
+    return kmeans, clusters
+
 def clustering_analysis(df):
     """
     Analyze clusters in delivery performance.
     """
     try:
-        from sklearn.cluster import KMeans
-        
         # Prepare features
-        features = df[['delivery_days', 'order_purchase_timestamp']].copy()
-        features['days_since_start'] = (features['order_purchase_timestamp'] - features['order_purchase_timestamp'].min()).dt.days
-        features = features[['delivery_days', 'days_since_start']].dropna()
+        features = _clustering_features(df)
         
         if len(features) < 3:
             return {"error": "Insufficient data for clustering"}
         
-        # Normalize
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(features)
-        
-        # Cluster
-        kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
-        clusters = kmeans.fit_predict(features_scaled)
+        kmeans, clusters = _fit_clusters(features)
         
         # Analyze
         analysis = {
@@ -87,19 +113,58 @@ def clustering_analysis(df):
             "cluster_details": []
         }
         
+        # Per-cluster stats on the delivery days column only, not filtered frame copies
+        delivery_days = features['delivery_days']
         for i in range(kmeans.n_clusters):
-            cluster_data = features[clusters == i]
+            cluster_days = delivery_days[clusters == i]
             analysis["cluster_details"].append({
                 "cluster": i,
-                "size": int(len(cluster_data)),
-                "avg_delivery_days": round(float(cluster_data['delivery_days'].mean()), 2),
-                "std_delivery_days": round(float(cluster_data['delivery_days'].std()), 2)
+                "size": int(len(cluster_days)),
+                "avg_delivery_days": round(float(cluster_days.mean()), 2),
+                "std_delivery_days": round(float(cluster_days.std()), 2)
             })
         
         return analysis
     except Exception as e:
         return {"error": str(e)}
 
+def cluster_assignments(df):
+    """
+    Per-order cluster labels from the same model as clustering_analysis.
+    """
+    features = _clustering_features(df)
+    if len(features) < 3:
+        return pd.DataFrame(columns=['order_id', 'delivery_days', 'days_since_start', 'cluster'])
+    
+    _, clusters = _fit_clusters(features)
+    assignments = features.copy()
+    assignments['cluster'] = clusters
+    if 'order_id' in df.columns:
+        assignments.insert(0, 'order_id', df.loc[assignments.index, 'order_id'])
+    return assignments
+
+def anomaly_bounds(delivery_days):
+    """IQR fences used to flag delivery-time anomalies."""
+    Q1 = delivery_days.quantile(0.25)
+    Q3 = delivery_days.quantile(0.75)
+    IQR = Q3 - Q1
+    return Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+
+def anomaly_records(df):
+    """
+    Orders flagged by anomaly_detection, labelled fast or slow.
+    """
+    delivery_days = df['delivery_days'].dropna()
+    if len(delivery_days) < 5:
+        return pd.DataFrame(columns=['order_id', 'delivery_days', 'anomaly_type'])
+    
+    lower_bound, upper_bound = anomaly_bounds(delivery_days)
+    records = df.loc[(df['delivery_days'] < lower_bound) | (df['delivery_days'] > upper_bound)]
+    columns = [col for col in ['order_id', 'order_status', 'order_purchase_timestamp', 'delivery_days'] if col in df.columns]
+    records = records[columns].copy()
+    records['anomaly_type'] = np.where(records['delivery_days'] < lower_bound, 'fast', 'slow')
+    return records
+
 def anomaly_detection(df):
     """
     Detect anomalies in delivery performance.
@@ -112,51 +177,185 @@ def anomaly_detection(df):
             return {"error": "Insufficient data for anomaly detection"}
         
         # Use IQR method
-        Q1 = delivery_days.quantile(0.25)
-        Q3 = delivery_days.quantile(0.75)
-        IQR = Q3 - Q1
-        
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
+        lower_bound, upper_bound = anomaly_bounds(delivery_days)
         
-        anomalies = df[(df['delivery_days'] < lower_bound) | (df['delivery_days'] > upper_bound)]
+        # Count on the column instead of materializing filtered frames
+        fast = int((delivery_days < lower_bound).sum())
+        slow = int((delivery_days > upper_bound).sum())
+        anomalies = fast + slow
         
         return {
             "success": True,
             "total_records": int(len(df)),
-            "anomalies_detected": int(len(anomalies)),
-            "anomaly_percentage": round((len(anomalies) / len(df)) * 100, 2),
+            "anomalies_detected": anomalies,
+            "anomaly_percentage": round((anomalies / len(df)) * 100, 2),
             "lower_bound": round(float(lower_bound), 2),
             "upper_bound": round(float(upper_bound), 2),
             "details": {
-                "fast_deliveries": int(len(df[df['delivery_days'] < lower_bound])),
-                "slow_deliveries": int(len(df[df['delivery_days'] > upper_bound]))
+                "fast_deliveries": fast,
+                "slow_deliveries": slow
             }
         }
     except Exception as e:
         return {"error": str(e)}
 
-def correlation_analysis(df):
+def quantile_from_counts(values, counts, q):
+    """
+    Quantile with linear interpolation (the pandas default) of data given
+    as sorted distinct ``values`` and their ``counts``.
+    """
+    cumulative = np.cumsum(counts)
+    position = (cumulative[-1] - 1) * q
+    below = int(np.floor(position))
+    lower = values[np.searchsorted(cumulative, below, side='right')]
+    upper = values[min(np.searchsorted(cumulative, below + 1, side='right'), len(values) - 1)]
+    fraction = position - below
+    # Same lerp form as NumPy, so results match bit for bit
+    if fraction >= 0.5:
+        return upper - (upper - lower) * (1 - fraction)
+    return lower + (upper - lower) * fraction
+
+def anomaly_summary_from_counts(values, counts, total_records):
+    """
+    The anomaly_detection result computed from the distinct delivery_days
+    values and their counts, for engines that aggregate without a frame.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.sum() < 5:
+        return {"error": "Insufficient data for anomaly detection"}
+
+    Q1 = quantile_from_counts(values, counts, 0.25)
+    Q3 = quantile_from_counts(values, counts, 0.75)
+    IQR = Q3 - Q1
+    lower_bound, upper_bound = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+
+    fast = int(counts[values < lower_bound].sum())
+    slow = int(counts[values > upper_bound].sum())
+    return {
+        "success": True,
+        "total_records": int(total_records),
+        "anomalies_detected": fast + slow,
+        "anomaly_percentage": round(((fast + slow) / total_records) * 100, 2),
+        "lower_bound": round(float(lower_bound), 2),
+        "upper_bound": round(float(upper_bound), 2),
+        "details": {
+            "fast_deliveries": fast,
+            "slow_deliveries": slow
+        }
+    }
+
+# Above this many numeric columns correlation_analysis switches to Spearman on a row sample
+WIDE_COLUMN_THRESHOLD = 50
+CORRELATION_SAMPLE_ROWS = 200_000
+STRONG_CORRELATION = 0.5
+
+def pairwise_correlation(values):
+    """
+    Pearson correlation matrix of a 2-D float array using pairwise-complete
+    observations, like DataFrame.corr(), computed with a few float32 matrix
+    products instead of one pass per column pair.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    present = ~np.isnan(values)
+    weights = present.astype(np.float32)
+    # Centering first keeps float32 sums of squares accurate
+    centered = np.where(present, values - np.nanmean(values, axis=0), 0).astype(np.float32)
+    
+    n = weights.T @ weights
+    sum_x = centered.T @ weights
+    sum_xx = (centered * centered).T @ weights
+    sum_xy = centered.T @ centered
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x * sum_x / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[n < 2] = np.nan
+    np.clip(corr, -1, 1, out=corr)
+    np.fill_diagonal(corr, np.where(np.diag(var_x) > 0, 1.0, np.nan))
+    return corr
+
+def top_correlated_pairs(columns, corr, top_k=10):
+    """
+    The ``top_k`` column pairs with the largest |r| from the upper triangle,
+    selected with argpartition.
+    """
+    rows, cols = np.triu_indices(len(columns), k=1)
+    strength = np.abs(corr[rows, cols])
+    strength = np.where(np.isnan(strength), -1, strength)
+    k = min(top_k, int((strength >= 0).sum()))
+    if k <= 0:
+        return []
+    
+    top = np.argpartition(-strength, k - 1)[:k]
+    top = top[np.argsort(-strength[top])]
+    return [
+        {
+            "column_1": columns[rows[i]],
+            "column_2": columns[cols[i]],
+            "correlation": round(float(corr[rows[i], cols[i]]), 4)
+        }
+        for i in top
+    ]
+
+def compute_correlations(df, method=None, sample_rows=None, top_k=10):
+    """
+    Correlation matrix and strongest pairs for the numeric columns.
+    ``method`` is 'pearson' or 'spearman'; by default wide frames use
+    Spearman on at most CORRELATION_SAMPLE_ROWS sampled rows.
+    """
+    numeric_df = df.select_dtypes(include=[np.number])
+    columns = [str(col) for col in numeric_df.columns]
+    
+    if method is None:
+        method = 'spearman' if len(columns) > WIDE_COLUMN_THRESHOLD else 'pearson'
+    if sample_rows is None and len(columns) > WIDE_COLUMN_THRESHOLD:
+        sample_rows = CORRELATION_SAMPLE_ROWS
+    if sample_rows and len(numeric_df) > sample_rows:
+        numeric_df = numeric_df.sample(n=sample_rows, random_state=42)
+    if method == 'spearman':
+        numeric_df = numeric_df.rank(method='average')
+    
+    corr = pairwise_correlation(numeric_df.to_numpy(dtype=np.float32, na_value=np.nan))
+    return {
+        "method": method,
+        "columns": columns,
+        "rows_used": int(len(numeric_df)),
+        "matrix": corr,
+        "top_pairs": top_correlated_pairs(columns, corr, top_k)
+    }
+
+def correlation_analysis(df, correlations=None):
     """
     Perform correlation analysis on numeric columns.
+    ``correlations`` takes a cached compute_correlations result.
     """
     try:
-        numeric_df = df.select_dtypes(include=[np.number])
-        
-        if numeric_df.empty:
-            return {"error": "No numeric columns found"}
+        if correlations is None:
+            if df.select_dtypes(include=[np.number]).empty:
+                return {"error": "No numeric columns found"}
+            correlations = compute_correlations(df)
         
-        correlation_matrix = numeric_df.corr().to_dict()
+        columns = correlations["columns"]
+        matrix = correlations["matrix"]
+        correlation_matrix = {
+            col: {other: (None if np.isnan(matrix[j, i]) else round(float(matrix[j, i]), 4)) for j, other in enumerate(columns)}
+            for i, col in enumerate(columns)
+        }
         
         return {
             "success": True,
+            "method": correlations["method"],
             "correlation_matrix": correlation_matrix,
-            "strong_correlations": []
+            "strong_correlations": [
+                pair for pair in correlations["top_pairs"] if abs(pair["correlation"]) >= STRONG_CORRELATION
+            ]
         }
     except Exception as e:
         return {"error": str(e)}
 
-def get_all_ml_insights(df):
+def get_all_ml_insights(df, correlations=None):
     """
     Generate comprehensive ML-based insights.
     """
@@ -164,5 +363,5 @@ def get_all_ml_insights(df):
         "predictions": predict_future_orders(df, months_ahead=6),
         "clustering": clustering_analysis(df),
         "anomalies": anomaly_detection(df),
-        "correlations": correlation_analysis(df)
+        "correlations": correlation_analysis(df, correlations)
     }
@@ -0,0 +1,223 @@
+"""
+Multi-table Olist loader and join engine.
+
+The related Olist CSVs (items, payments, customers, sellers) are
+registered next to the orders dataset but only read when a query needs
+one of their columns, and only that column is kept. Joins are done once
+as integer position arrays (e.g. the order row of every item row); a
+joined column is then a single ``take`` instead of a ``pd.merge``.
+"""
+
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RELATED_TABLES = {
+    "items": "olist_order_items_dataset.csv",
+    "payments": "olist_order_payments_dataset.csv",
+    "customers": "olist_customers_dataset.csv",
+    "sellers": "olist_sellers_dataset.csv"
+}
+
+
+class MissingTableError(LookupError):
+    """Raised when a query needs a related table whose CSV is not present."""
+
+
+class OlistCatalog:
+
+    def __init__(self, orders, data_dir):
+        self.orders = orders
+        self.data_dir = Path(data_dir)
+        self.paths = {
+            name: self.data_dir / filename
+            for name, filename in RELATED_TABLES.items()
+            if (self.data_dir / filename).exists()
+        }
+        self._columns = {}
+        self._positions = {}
+        self._lock = threading.RLock()
+
+    def available(self):
+        return sorted(self.paths)
+
+    # ------------------------------
+    # Lazy column storage
+    # ------------------------------
+
+    def column(self, table, name):
+        """
+        One column of a related table, read from disk on first use.
+        Numeric columns are NumPy arrays, text columns pd.Categorical.
+        """
+        with self._lock:
+            key = (table, name)
+            if key not in self._columns:
+                if table not in self.paths:
+                    raise MissingTableError(f"{RELATED_TABLES[table]} not found in {self.data_dir}")
+                values = pd.read_csv(self.paths[table], usecols=[name])[name]
+                if pd.api.types.is_numeric_dtype(values):
+                    self._columns[key] = values.to_numpy()
+                else:
+                    self._columns[key] = pd.Categorical(values)
+            return self._columns[key]
+
+    # ------------------------------
+    # Key indexes (built once)
+    # ------------------------------
+
+    def positions(self, relation):
+        """
+        Row positions linking two tables, -1 where the key has no match:
+        ``items->orders``, ``payments->orders``, ``orders->customers``, ``items->sellers``.
+        """
+        with self._lock:
+            if relation not in self._positions:
+                self._positions[relation] = self._build_positions(relation)
+            return self._positions[relation]
+
+    def _build_positions(self, relation):
+        if relation in ("items->orders", "payments->orders"):
+            table = relation.split("->")[0]
+            return _first_match(self.orders['order_id'], self.column(table, "order_id"))
+        if relation == "orders->customers":
+            return _first_match(self.column("customers", "customer_id"), self.orders['customer_id'])
+        if relation == "items->sellers":
+            return _first_match(self.column("sellers", "seller_id"), self.column("items", "seller_id"))
+        raise ValueError(f"Unknown relation: {relation}")
+
+    def take_codes(self, relation, codes):
+        """
+        Gather integer ``codes`` defined on the target table of ``relation``
+        onto the source rows; unmatched rows get -1.
+        """
+        pos = self.positions(relation)
+        return np.where(pos >= 0, np.asarray(codes)[np.where(pos >= 0, pos, 0)], -1)
+
+
+def _first_match(target_keys, source_keys):
+    """
+    Position in ``target_keys`` of each source key, -1 where it is missing.
+    A key repeated in the target links to its first row.
+    """
+    target = pd.Series(np.asarray(target_keys))
+    unique = target.drop_duplicates(keep="first")
+    positions = pd.Index(unique.to_numpy()).get_indexer(np.asarray(source_keys))
+    return np.where(positions >= 0, unique.index.to_numpy()[np.where(positions >= 0, positions, 0)], -1)
+
+
+def _late_flags(orders):
+    delivered = orders['order_delivered_customer_date'].to_numpy()
+    estimated = orders['order_estimated_delivery_date'].to_numpy()
+    return (delivered > estimated)
+
+
+def _grouped_delivery(codes, labels, order_pos, orders, revenue=None):
+    """
+    Per-group order count, average delivery days and late rate, computed with
+    bincount over integer group codes. ``order_pos`` maps each row to its order.
+    """
+    valid = (codes >= 0) & (order_pos >= 0)
+    codes = codes[valid]
+    order_pos = order_pos[valid]
+    n_groups = len(labels)
+
+    # Count each (group, order) pair once, even when an order has several rows
+    pair = codes.astype(np.int64) * len(orders) + order_pos
+    _, first = np.unique(pair, return_index=True)
+    g, o = codes[first], order_pos[first]
+
+    delivery_days = orders['delivery_days'].to_numpy(dtype=np.float64)[o]
+    late = _late_flags(orders)[o]
+    has_days = ~np.isnan(delivery_days)
+
+    orders_count = np.bincount(g, minlength=n_groups)
+    delivered_count = np.bincount(g, weights=has_days, minlength=n_groups)
+    days_sum = np.bincount(g, weights=np.where(has_days, delivery_days, 0), minlength=n_groups)
+    late_count = np.bincount(g, weights=late, minlength=n_groups)
+    revenue_sum = np.bincount(codes, weights=revenue[valid], minlength=n_groups) if revenue is not None else None
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_days = days_sum / delivered_count
+        late_rate = late_count / orders_count * 100
+
+    rows = []
+    for i in np.flatnonzero(orders_count):
+        row = {
+            "orders": int(orders_count[i]),
+            "average_delivery_days": None if np.isnan(avg_days[i]) else round(float(avg_days[i]), 2),
+            "late_delivery_percentage": round(float(late_rate[i]), 2)
+        }
+        if revenue_sum is not None:
+            row["revenue"] = round(float(revenue_sum[i]), 2)
+        rows.append((str(labels[i]), row))
+    return rows
+
+
+def revenue_summary(catalog):
+    """Item revenue, freight and payments, in total and per purchase month."""
+    orders = catalog.orders
+    price = catalog.column("items", "price").astype(np.float64)
+    freight = catalog.column("items", "freight_value").astype(np.float64)
+    order_pos = catalog.positions("items->orders")
+    matched = order_pos >= 0
+
+    period = orders['order_purchase_timestamp'].dt.to_period('M')
+    month_codes, months = pd.factorize(period, sort=True)
+    item_months = catalog.take_codes("items->orders", month_codes)
+    keep = item_months >= 0
+
+    revenue_by_month = np.bincount(item_months[keep], weights=price[keep], minlength=len(months))
+    freight_by_month = np.bincount(item_months[keep], weights=freight[keep], minlength=len(months))
+
+    result = {
+        "total_revenue": round(float(price.sum()), 2),
+        "total_freight": round(float(freight.sum()), 2),
+        "items": int(len(price)),
+        "orders_with_items": int(np.unique(order_pos[matched]).size),
+        "unmatched_items": int((~matched).sum()),
+        "monthly": [
+            {
+                "purchase_year": int(p.year),
+                "purchase_month": int(p.month),
+                "revenue": round(float(revenue_by_month[i]), 2),
+                "freight": round(float(freight_by_month[i]), 2)
+            }
+            for i, p in enumerate(months)
+        ]
+    }
+    result["average_order_value"] = round(result["total_revenue"] / result["orders_with_items"], 2) if result["orders_with_items"] else 0.0
+
+    if "payments" in catalog.paths:
+        payments = catalog.column("payments", "payment_value").astype(np.float64)
+        result["total_payments"] = round(float(payments.sum()), 2)
+    return result
+
+
+def seller_delivery_metrics(catalog, limit=20):
+    """Delivery metrics per seller, busiest sellers first."""
+    seller_codes, sellers = pd.factorize(catalog.column("items", "seller_id"))
+    price = catalog.column("items", "price").astype(np.float64)
+    rows = _grouped_delivery(seller_codes, sellers, catalog.positions("items->orders"), catalog.orders, price)
+    rows.sort(key=lambda item: item[1]["orders"], reverse=True)
+    rows = rows[:limit]
+
+    if "sellers" in catalog.paths:
+        states = catalog.column("sellers", "seller_state")
+        pos = _first_match(catalog.column("sellers", "seller_id"), [seller for seller, _ in rows])
+        return [
+            {"seller_id": seller, "seller_state": (str(states[p]) if p >= 0 else None), **stats}
+            for (seller, stats), p in zip(rows, pos)
+        ]
+    return [{"seller_id": seller, **stats} for seller, stats in rows]
+
+
+def state_delivery_metrics(catalog):
+    """Delivery metrics per customer state."""
+    state_codes, labels = pd.factorize(catalog.column("customers", "customer_state"), sort=True)
+    order_codes = catalog.take_codes("orders->customers", state_codes)
+
+    rows = _grouped_delivery(order_codes, labels, np.arange(len(catalog.orders)), catalog.orders)
+    return [{"customer_state": state, **stats} for state, stats in rows]
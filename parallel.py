@@ -0,0 +1,303 @@
+"""
+Partitioned aggregation on a persistent process pool.
+
+The columns the aggregate endpoints need are encoded once per dataset
+version as flat NumPy arrays (integer codes, int64 nanosecond
+timestamps, float delivery days) and written to a scratch directory.
+Pool workers open them with ``mmap_mode='r'``, so every process shares
+the same page cache instead of receiving a pickled copy. Each worker
+maps a fixed-size row range to partial sums; the parent combines them
+and shapes the results with the same helpers as the pandas functions.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from insights import format_insights, risk_message, format_academic_summary
+from metrics import ROLLING_WINDOWS, RISK_WINDOW_DAYS, metrics_from_totals, purchase_days, rolling_from_daily, latest_window_counts
+from ml_engine import anomaly_summary_from_counts
+
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+PARTITION_ROWS = int(os.getenv("PARALLEL_PARTITION_ROWS", "250000"))
+# Where the mmapped columns are written; /dev/shm keeps them in RAM on Linux
+COLUMN_DIR = os.getenv("PARALLEL_COLUMN_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+NAT = np.iinfo(np.int64).min
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process pool shared by every dataset version, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # fork where available: spawn would re-import the app's __main__ in every worker
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PARALLEL_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def start_pool():
+    """
+    Start the workers now. Call it at startup, before the dataset loads and
+    before any server threads exist, so workers fork from a small image.
+    """
+    get_pool().submit(int).result()
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+# ==============================
+# Column encoding
+# ==============================
+
+def _nanoseconds(series):
+    values = series.to_numpy(dtype="datetime64[ns]").view("int64").copy()
+    values[series.isna().to_numpy()] = NAT
+    return values
+
+
+def encode_columns(df):
+    """
+    Flat arrays for the partitioned aggregates, plus the labels of the
+    integer codes: status codes in order of first appearance, month
+    codes (-1 for missing) in calendar order and the first purchase day
+    (day codes count from it).
+    """
+    status_codes, statuses = pd.factorize(df['order_status'])
+    month_key = df['purchase_year'] * 12 + df['purchase_month'] - 1
+    month_codes, month_keys = pd.factorize(month_key, sort=True)
+    days = purchase_days(df)
+    first_day = int(days[days >= 0].min()) if (days >= 0).any() else 0
+
+    arrays = {
+        "status": status_codes.astype(np.int32),
+        "month": month_codes.astype(np.int32),
+        "day": np.where(days >= 0, days - first_day, -1).astype(np.int32),
+        "delivered": _nanoseconds(df['order_delivered_customer_date']),
+        "estimated": _nanoseconds(df['order_estimated_delivery_date']),
+        "delivery_days": df['delivery_days'].to_numpy(dtype=np.float64)
+    }
+    months = [(int(key) // 12, int(key) % 12 + 1) for key in month_keys]
+    return arrays, list(statuses), months, first_day
+
+
+class MappedColumns:
+    """Arrays written to ``.npy`` files that pool workers memory-map."""
+
+    def __init__(self, arrays, directory=COLUMN_DIR):
+        self.path = tempfile.mkdtemp(prefix="olist-columns-", dir=directory)
+        self.rows = len(next(iter(arrays.values())))
+        for name, values in arrays.items():
+            np.save(os.path.join(self.path, f"{name}.npy"), values)
+        # Remove the files when the dataset version is dropped
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def close(self):
+        self._cleanup()
+
+
+# ==============================
+# Map / combine
+# ==============================
+
+# Per-worker memory maps of the active column directory
+_mapped = {}
+
+
+def _open_columns(path):
+    if path not in _mapped:
+        _mapped.clear()
+        _mapped[path] = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+    return _mapped[path]
+
+
+def map_partition(columns, start, stop, n_status, n_months, n_days):
+    """Partial aggregates for rows ``start:stop``."""
+    delivered = columns["delivered"][start:stop]
+    estimated = columns["estimated"][start:stop]
+    both = (delivered != NAT) & (estimated != NAT)
+    days = columns["delivery_days"][start:stop]
+    days = days[~np.isnan(days)]
+    status = columns["status"][start:stop]
+    month = columns["month"][start:stop]
+    values, counts = np.unique(days, return_counts=True)
+
+    # Per purchase day totals for the rolling KPIs
+    day = columns["day"][start:stop]
+    on_day = day >= 0
+    day_days = columns["delivery_days"][start:stop][on_day]
+    has_days = ~np.isnan(day_days)
+    day = day[on_day]
+
+    return {
+        "rows": stop - start,
+        "late": int((both & (delivered > estimated)).sum()),
+        "on_time": int((both & (delivered <= estimated)).sum()),
+        "days_sum": float(days.sum()),
+        "days_count": int(days.size),
+        "status": np.bincount(status[status >= 0], minlength=n_status),
+        "month": np.bincount(month[month >= 0], minlength=n_months),
+        "day_values": values,
+        "day_counts": counts,
+        "daily_orders": np.bincount(day, minlength=n_days),
+        "daily_late": np.bincount(day, weights=(both & (delivered > estimated))[on_day], minlength=n_days),
+        "daily_delivered": np.bincount(day, weights=has_days, minlength=n_days),
+        "daily_days_sum": np.bincount(day, weights=np.where(has_days, day_days, 0), minlength=n_days)
+    }
+
+
+def _map_mapped_partition(path, start, stop, n_status, n_months, n_days):
+    """Pool task: map a partition of the memory-mapped columns."""
+    return map_partition(_open_columns(path), start, stop, n_status, n_months, n_days)
+
+
+def combine_partials(partials):
+    """Merge partial aggregates from every partition."""
+    values, inverse = np.unique(np.concatenate([p["day_values"] for p in partials]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([p["day_counts"] for p in partials]), minlength=len(values))
+    return {
+        "rows": sum(p["rows"] for p in partials),
+        "late": sum(p["late"] for p in partials),
+        "on_time": sum(p["on_time"] for p in partials),
+        "days_sum": sum(p["days_sum"] for p in partials),
+        "days_count": sum(p["days_count"] for p in partials),
+        "status": np.sum([p["status"] for p in partials], axis=0),
+        "month": np.sum([p["month"] for p in partials], axis=0),
+        "day_values": values,
+        "day_counts": counts.astype(np.int64),
+        "daily": {
+            field: np.sum([p[f"daily_{field}"] for p in partials], axis=0).astype(np.float64)
+            for field in ("orders", "late", "delivered", "days_sum")
+        }
+    }
+
+
+def partition_bounds(rows, partition_rows=PARTITION_ROWS):
+    return [(start, min(start + partition_rows, rows)) for start in range(0, rows, partition_rows)] or [(0, 0)]
+
+
+class PartitionedBackend:
+    """
+    Analytics backend (see backends.py) whose aggregates run as one fused
+    map/combine pass over row partitions. The pass runs once per dataset
+    version; the pool is only used when there is more than one partition.
+    """
+
+    name = "parallel"
+
+    def __init__(self, df, partition_rows=PARTITION_ROWS):
+        self.partition_rows = partition_rows
+        self._arrays, self.statuses, self.months, self.first_day = encode_columns(df)
+        day = self._arrays["day"]
+        self.n_days = int(day.max()) + 1 if (day >= 0).any() else 0
+        self.rows = len(df)
+        self._columns = None
+        self._totals = None
+        self._lock = threading.Lock()
+
+    def _run(self):
+        bounds = partition_bounds(self.rows, self.partition_rows)
+        sizes = (len(self.statuses), len(self.months), self.n_days)
+        if len(bounds) == 1 or PARALLEL_WORKERS <= 1:
+            return [map_partition(self._arrays, start, stop, *sizes) for start, stop in bounds]
+
+        if self._columns is None:
+            self._columns = MappedColumns(self._arrays)
+        pool = get_pool()
+        futures = [
+            pool.submit(_map_mapped_partition, self._columns.path, start, stop, *sizes)
+            for start, stop in bounds
+        ]
+        return [future.result() for future in futures]
+
+    def totals(self):
+        with self._lock:
+            if self._totals is None:
+                self._totals = combine_partials(self._run())
+            return self._totals
+
+    def _average_days(self, totals):
+        return totals["days_sum"] / totals["days_count"] if totals["days_count"] else None
+
+    def _month_records(self):
+        counts = self.totals()["month"]
+        return [
+            {"purchase_year": year, "purchase_month": month, "order_count": int(count)}
+            for (year, month), count in zip(self.months, counts)
+        ]
+
+    def metrics(self):
+        totals = self.totals()
+        return metrics_from_totals(totals["rows"], self._average_days(totals) if totals["rows"] else 0.0, totals["late"])
+
+    def delivery_breakdown(self):
+        totals = self.totals()
+        return {"on_time_deliveries": totals["on_time"], "late_deliveries": totals["late"]}
+
+    def order_status_distribution(self):
+        counts = self.totals()["status"]
+        # Stable sort keeps first-appearance order for ties, like value_counts
+        order = np.argsort(-counts, kind="stable")
+        return {self.statuses[i]: int(counts[i]) for i in order if counts[i]}
+
+    def monthly_trend(self):
+        return self._month_records()
+
+    def top_5_months(self):
+        records = self._month_records()
+        return sorted(records, key=lambda row: -row["order_count"])[:5]
+
+    def yearly_summary(self):
+        yearly = {}
+        for row in self._month_records():
+            yearly[row["purchase_year"]] = yearly.get(row["purchase_year"], 0) + row["order_count"]
+        return [{"purchase_year": year, "order_count": count} for year, count in yearly.items()]
+
+    def insights(self):
+        totals = self.totals()
+        if not totals["rows"]:
+            return format_insights(0, "unknown", 0.0)
+        distribution = self.order_status_distribution()
+        return format_insights(totals["rows"], next(iter(distribution), None), self._average_days(totals))
+
+    def _daily(self):
+        return (self.first_day if self.n_days else None), self.totals()["daily"]
+
+    def rolling_kpis(self, windows=ROLLING_WINDOWS):
+        return rolling_from_daily(*self._daily(), windows)
+
+    def risk_alert(self):
+        late, orders = latest_window_counts(*self._daily(), RISK_WINDOW_DAYS)
+        return risk_message(late, orders, RISK_WINDOW_DAYS)
+
+    def academic_summary(self):
+        totals = self.totals()
+        return format_academic_summary(totals["rows"], totals["late"])
+
+    def anomalies(self):
+        totals = self.totals()
+        return anomaly_summary_from_counts(totals["day_values"], totals["day_counts"], totals["rows"])
+
+    def close(self):
+        if self._columns is not None:
+            self._columns.close()
@@ -0,0 +1,383 @@
+"""
+Request profiling and hot-path instrumentation.
+
+Collects per-route latency histograms, per-stage timings (load,
+preprocess, aggregate, ml_fit, serialize), pandas call counts, memory
+and cache statistics, and renders them in the Prometheus text format.
+An opt-in sampling profiler can dump the stacks seen during a request.
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROFILE_PANDAS = os.getenv("PROFILE_PANDAS", "0") == "1"
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "0") == "1"
+ENABLE_REQUEST_PROFILER = os.getenv("ENABLE_REQUEST_PROFILER", "0") == "1"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = _format_labels(self.label_names, labels)
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names + ("le",), labels + (repr(bound),))} {count}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names + ("le",), labels + ("+Inf",))} {series["count"]}')
+                lines.append(f"{self.name}_sum{base} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{base} {series['count']}")
+        return lines
+
+
+class CounterMetric:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+REQUEST_LATENCY = Histogram(
+    "app_request_duration_seconds", "Request latency per route.", ("route", "method", "status")
+)
+STAGE_LATENCY = Histogram(
+    "app_stage_duration_seconds", "Time spent per pipeline stage.", ("stage", "route")
+)
+REQUEST_ERRORS = CounterMetric(
+    "app_request_errors_total", "Exceptions raised while handling a route, including ones turned into fallback responses.", ("route", "exception")
+)
+PANDAS_CALLS = CounterMetric(
+    "app_pandas_calls_total", "Calls to instrumented pandas functions (PROFILE_PANDAS=1).", ("function", "route")
+)
+REQUEST_PEAK_MEMORY = Histogram(
+    "app_request_peak_memory_bytes", "Peak Python heap allocation of requests that ran alone (PROFILE_MEMORY=1).", ("route",),
+    buckets=(1e5, 1e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9, 2e9)
+)
+QUEUE_WAIT = Histogram(
+    "app_queue_wait_seconds", "Time admitted requests waited for a slot in their cost class.", ("cost_class",),
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+ADMISSION_REJECTIONS = CounterMetric(
+    "app_admission_rejections_total", "Requests turned away by admission control.", ("cost_class", "reason")
+)
+ADMISSION_DEDUPLICATED = CounterMetric(
+    "app_admission_deduplicated_total", "Requests answered with the response of an identical request in flight.", ("route",)
+)
+
+_registered_caches = {}
+_gauge_providers = {}
+_local = threading.local()
+logger = logging.getLogger(__name__)
+
+# The tracemalloc peak is process-wide, so a request's peak is only kept
+# when no other request ran at any point during it
+_memory_lock = threading.Lock()
+_memory_in_flight = 0
+_memory_overlapped = False
+
+
+def _current_route():
+    return getattr(_local, "route", None) or "background"
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage and attribute it to the current route."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe((name, _current_route()), elapsed)
+        timings = getattr(_local, "stages", None)
+        if timings is not None:
+            timings[name] += elapsed
+
+
+def record_error(error):
+    """Count an exception that a route turned into a fallback response."""
+    REQUEST_ERRORS.inc((_current_route(), type(error).__name__))
+    logger.error("[%s] %s: %s", _current_route(), type(error).__name__, error, exc_info=error)
+
+
+def register_cache(name, cache):
+    """Expose a cache's ``stats()`` hit/miss counters on the metrics endpoint."""
+    _registered_caches[name] = cache
+
+
+def register_gauge(name, help_text, provider, label_name=None):
+    """
+    Expose the value returned by ``provider()`` as a gauge. With
+    ``label_name`` the provider returns a dict of label value -> number.
+    """
+    _gauge_providers[name] = (help_text, provider, label_name)
+
+
+# ==============================
+# Pandas call counting
+# ==============================
+
+PANDAS_FUNCTIONS = [
+    ("DataFrame", "groupby"), ("DataFrame", "copy"), ("DataFrame", "merge"), ("DataFrame", "to_dict"),
+    ("DataFrame", "corr"), ("DataFrame", "describe"), ("DataFrame", "dropna"), ("DataFrame", "select_dtypes"),
+    ("DataFrame", "isnull"), ("Series", "value_counts"), ("Series", "quantile"), ("Series", "to_dict"),
+    ("module", "to_datetime"), ("module", "read_csv")
+]
+
+
+def install_pandas_counters():
+    """Wrap a fixed set of pandas entry points with call counters."""
+    import pandas as pd
+
+    for owner_name, attr in PANDAS_FUNCTIONS:
+        owner = pd if owner_name == "module" else getattr(pd, owner_name)
+        original = getattr(owner, attr)
+        if getattr(original, "_profiled", False):
+            continue
+        label = attr if owner_name == "module" else f"{owner_name}.{attr}"
+
+        def make_wrapper(func, label):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                PANDAS_CALLS.inc((label, _current_route()))
+                return func(*args, **kwargs)
+            wrapper._profiled = True
+            return wrapper
+
+        setattr(owner, attr, make_wrapper(original, label))
+
+
+# ==============================
+# Sampling profiler
+# ==============================
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts folded stacks."""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            self.samples[";".join(f"{Path(f.filename).name}:{f.name}" for f in stack)] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Write samples in folded-stack format (flamegraph.pl / speedscope)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+
+# ==============================
+# Flask integration
+# ==============================
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def init_app(app):
+    """Register request hooks that feed the route metrics."""
+    from flask import g, request
+
+    if PROFILE_PANDAS:
+        install_pandas_counters()
+
+    @app.before_request
+    def _start_request_timer():
+        g.profile_start = time.perf_counter()
+        _local.route = request.url_rule.rule if request.url_rule else "unmatched"
+        _local.stages = defaultdict(float)
+
+        if PROFILE_MEMORY:
+            _start_memory_tracking()
+
+        g.profiler = None
+        if ENABLE_REQUEST_PROFILER and request.args.get("profile") == "1":
+            g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("profile_start", None)
+        if start is None:
+            return response
+        route = _current_route()
+        REQUEST_LATENCY.observe((route, request.method, str(response.status_code)), time.perf_counter() - start)
+
+        if PROFILE_MEMORY:
+            peak = _request_peak_memory()
+            if peak is not None:
+                REQUEST_PEAK_MEMORY.observe((route,), peak)
+
+        stages = getattr(_local, "stages", None) or {}
+        if stages:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in stages.items()
+            )
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            dump_name = f"{route.strip('/').replace('/', '_') or 'root'}-{int(time.time() * 1000)}.folded"
+            response.headers["X-Profile-Dump"] = str(profiler.dump(PROFILE_DIR / dump_name))
+        return response
+
+    @app.teardown_request
+    def _clear_request_state(error=None):
+        if PROFILE_MEMORY:
+            _finish_memory_tracking()
+        _local.route = None
+        _local.stages = None
+
+
+def _start_memory_tracking():
+    global _memory_in_flight, _memory_overlapped
+    import tracemalloc
+    from flask import g
+
+    with _memory_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _memory_in_flight += 1
+        g.memory_solo = _memory_in_flight == 1
+        if g.memory_solo:
+            _memory_overlapped = False
+            tracemalloc.reset_peak()
+        else:
+            _memory_overlapped = True
+
+
+def _request_peak_memory():
+    """Peak traced memory of the current request, or None if another request overlapped it."""
+    import tracemalloc
+    from flask import g
+
+    with _memory_lock:
+        if not g.get("memory_solo") or _memory_overlapped:
+            return None
+        return tracemalloc.get_traced_memory()[1]
+
+
+def _finish_memory_tracking():
+    global _memory_in_flight
+    from flask import g
+
+    if g.pop("memory_solo", None) is None:
+        return
+    with _memory_lock:
+        _memory_in_flight -= 1
+
+
+def render_prometheus():
+    """All collected metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in (REQUEST_LATENCY, STAGE_LATENCY, REQUEST_ERRORS, PANDAS_CALLS, REQUEST_PEAK_MEMORY,
+                   QUEUE_WAIT, ADMISSION_REJECTIONS, ADMISSION_DEDUPLICATED):
+        lines.extend(metric.render())
+
+    peak = peak_rss_bytes()
+    if peak is not None:
+        lines += ["# HELP app_process_peak_rss_bytes Peak resident set size of the process.",
+                  "# TYPE app_process_peak_rss_bytes gauge",
+                  f"app_process_peak_rss_bytes {peak}"]
+
+    if _registered_caches:
+        lines += ["# HELP app_cache_hits_total Cache lookups served from the cache.", "# TYPE app_cache_hits_total counter"]
+        lines += [f'app_cache_hits_total{{cache="{name}"}} {cache.stats()["hits"]}' for name, cache in _registered_caches.items()]
+        lines += ["# HELP app_cache_misses_total Cache lookups that had to compute.", "# TYPE app_cache_misses_total counter"]
+        lines += [f'app_cache_misses_total{{cache="{name}"}} {cache.stats()["misses"]}' for name, cache in _registered_caches.items()]
+        lines += ["# HELP app_cache_hit_ratio Share of cache lookups that were hits.", "# TYPE app_cache_hit_ratio gauge"]
+        lines += [f'app_cache_hit_ratio{{cache="{name}"}} {cache.stats()["hit_rate"]}' for name, cache in _registered_caches.items()]
+
+    for name, (help_text, provider, label_name) in _gauge_providers.items():
+        value = provider()
+        if value is None:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        if label_name is None:
+            lines.append(f"{name} {value}")
+        else:
+            lines += [f"{name}{_format_labels((label_name,), (key,))} {v}" for key, v in sorted(value.items())]
+
+    return "\n".join(lines) + "\n"
@@ -1,27 +1,28 @@
 from io import BytesIO
+from functools import lru_cache
+from xml.sax.saxutils import escape
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
-def generate_pdf_report(df, metrics, status_dist, trends, insights):
+# Chart resolution is fixed so drawing cost does not grow with the date range
+MAX_CHART_POINTS = 120
+CHART_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#1f4a8a', '#9CA3AF']
+
+@lru_cache(maxsize=1)
+def _report_styles():
     """
-    Generate a professional PDF report of the analysis.
-    Requires reportlab and PIL to be installed.
+    Build the paragraph and table styles once per process.
+    Rebuilding the stylesheet for every download dominated small reports.
     """
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-        from reportlab.lib import colors
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-        
-        # Create PDF buffer
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        # Create styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+    styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
             'CustomTitle',
             parent=styles['Heading1'],
             fontSize=24,
@@ -29,9 +30,8 @@ def generate_pdf_report(df, metrics, status_dist, trends, insights):
             spaceAfter=10,
             alignment=TA_CENTER,
             fontName='Helvetica-Bold'
-        )
-        
-        heading_style = ParagraphStyle(
+        ),
+        "heading": ParagraphStyle(
             'CustomHeading',
             parent=styles['Heading2'],
             fontSize=14,
@@ -39,15 +39,206 @@ def generate_pdf_report(df, metrics, status_dist, trends, insights):
             spaceAfter=8,
             spaceBefore=8,
             fontName='Helvetica-Bold'
-        )
-        
-        text_style = ParagraphStyle(
+        ),
+        "text": ParagraphStyle(
             'CustomText',
             parent=styles['Normal'],
             fontSize=10,
             spaceAfter=6,
             alignment=TA_LEFT
-        )
+        ),
+        "footer": ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.grey,
+            alignment=TA_CENTER
+        ),
+        "metrics_table": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4a8a')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 10)
+        ]),
+        "status_table": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4a8a')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 9)
+        ])
+    }
+
+
+def downsample_series(labels, values, max_points=MAX_CHART_POINTS):
+    """
+    Reduce a series to at most ``max_points`` buckets by averaging
+    consecutive values. Each bucket keeps the label of its first point.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) <= max_points:
+        return list(labels), values.tolist()
+
+    starts = np.linspace(0, len(values), max_points, endpoint=False).astype(np.int64)
+    sums = np.add.reduceat(values, starts)
+    sizes = np.diff(np.append(starts, len(values)))
+    return [labels[i] for i in starts], (sums / sizes).tolist()
+
+
+def _trend_chart(trends):
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.linecharts import HorizontalLineChart
+    from reportlab.lib import colors
+
+    ordered = sorted(trends, key=lambda t: (t['purchase_year'], t['purchase_month']))
+    labels = [f"{int(t['purchase_year'])}-{int(t['purchase_month']):02d}" for t in ordered]
+    labels, values = downsample_series(labels, [t['order_count'] for t in ordered])
+
+    drawing = Drawing(480, 200)
+    chart = HorizontalLineChart()
+    chart.x, chart.y, chart.width, chart.height = 45, 40, 420, 145
+    chart.data = [values]
+    chart.lines[0].strokeColor = colors.HexColor('#1f4a8a')
+    chart.lines[0].strokeWidth = 2
+    chart.valueAxis.valueMin = 0
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.categoryAxis.labels.fontSize = 6
+    # Keep the axis readable for long ranges
+    step = max(1, len(labels) // 12)
+    chart.categoryAxis.categoryNames = [label if i % step == 0 else '' for i, label in enumerate(labels)]
+    chart.valueAxis.labels.fontSize = 7
+    drawing.add(chart)
+    return drawing
+
+
+def _status_chart(status_dist):
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.lib import colors
+
+    items = sorted(status_dist.items(), key=lambda item: item[1], reverse=True)
+    # Fold the long tail into one slice, like the dashboard legend
+    if len(items) > len(CHART_COLORS):
+        head = items[:len(CHART_COLORS) - 1]
+        items = head + [("other", sum(count for _, count in items[len(CHART_COLORS) - 1:]))]
+
+    drawing = Drawing(480, 170)
+    pie = Pie()
+    pie.x, pie.y, pie.width, pie.height = 40, 10, 150, 150
+    pie.data = [int(count) for _, count in items] or [1]
+    pie.labels = None
+    pie.slices.strokeColor = colors.white
+    for i in range(len(pie.data)):
+        pie.slices[i].fillColor = colors.HexColor(CHART_COLORS[i % len(CHART_COLORS)])
+    drawing.add(pie)
+
+    legend = Legend()
+    legend.x, legend.y = 240, 140
+    legend.fontSize = 8
+    legend.alignment = 'right'
+    legend.colorNamePairs = [
+        (colors.HexColor(CHART_COLORS[i % len(CHART_COLORS)]), f"{status} ({int(count):,})")
+        for i, (status, count) in enumerate(items)
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def _delivery_days_chart(delivery_days):
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.lib import colors
+
+    labels = [str(day) for day in delivery_days['days']]
+    labels[-1] = f"{labels[-1]}+"
+    labels, values = downsample_series(labels, delivery_days['order_count'])
+
+    drawing = Drawing(480, 180)
+    chart = VerticalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 45, 30, 420, 140
+    chart.data = [values]
+    chart.bars[0].fillColor = colors.HexColor('#4ECDC4')
+    chart.bars[0].strokeColor = None
+    chart.barSpacing = 0
+    chart.groupSpacing = 1
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.categoryAxis.labels.fontSize = 6
+    chart.categoryAxis.categoryNames = [label if i % 5 == 0 else '' for i, label in enumerate(labels)]
+    drawing.add(chart)
+    return drawing
+
+
+def _delivery_breakdown_chart(delivery):
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.barcharts import HorizontalBarChart
+    from reportlab.lib import colors
+
+    drawing = Drawing(480, 90)
+    chart = HorizontalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 60, 15, 400, 65
+    chart.data = [[delivery.get('on_time_deliveries', 0), delivery.get('late_deliveries', 0)]]
+    chart.bars[(0, 0)].fillColor = colors.HexColor('#4ECDC4')
+    chart.bars[(0, 1)].fillColor = colors.HexColor('#FF6B6B')
+    chart.bars.strokeColor = None
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.categoryAxis.categoryNames = ['On-Time', 'Late']
+    chart.categoryAxis.labels.fontSize = 8
+    drawing.add(chart)
+    return drawing
+
+
+def build_report_charts(status_dist, trends, delivery=None, delivery_days=None):
+    """
+    Build the report chart drawables from aggregate data.
+    Returns (title, drawing) pairs; they hold no reference to the dataframe
+    and can be cached and reused across renders.
+    """
+    charts = []
+    if trends:
+        charts.append(("Monthly Order Trend", _trend_chart(trends)))
+    if status_dist:
+        charts.append(("Order Status Breakdown", _status_chart(status_dist)))
+    if delivery:
+        charts.append(("On-Time vs Late Deliveries", _delivery_breakdown_chart(delivery)))
+    if delivery_days and sum(delivery_days['order_count']):
+        charts.append(("Delivery Days Distribution", _delivery_days_chart(delivery_days)))
+    return charts
+
+
+def generate_pdf_report(df, metrics, status_dist, trends, insights, charts=None):
+    """
+    Generate a professional PDF report of the analysis.
+    Requires reportlab and PIL to be installed.
+    ``charts`` takes prebuilt drawables from build_report_charts; they are
+    built from ``status_dist`` and ``trends`` when omitted.
+    """
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, KeepTogether
+        
+        # Create PDF buffer
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+        
+        # Prebuilt styles
+        styles = _report_styles()
+        title_style = styles["title"]
+        heading_style = styles["heading"]
+        text_style = styles["text"]
         
         # Build story
         story = []
@@ -82,17 +273,7 @@ def generate_pdf_report(df, metrics, status_dist, trends, insights):
         ]
         
         metrics_table = Table(metrics_data, colWidths=[3*inch, 2*inch])
-        metrics_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4a8a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 10)
-        ]))
+        metrics_table.setStyle(styles["metrics_table"])
         story.append(metrics_table)
         story.append(Spacer(1, 0.2*inch))
         
@@ -103,24 +284,23 @@ def generate_pdf_report(df, metrics, status_dist, trends, insights):
             status_data.append([status.title(), f"{count}"])
         
         status_table = Table(status_data, colWidths=[3*inch, 2*inch])
-        status_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4a8a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9)
-        ]))
+        status_table.setStyle(styles["status_table"])
         story.append(status_table)
         story.append(Spacer(1, 0.2*inch))
         
+        # Charts
+        if charts is None:
+            charts = build_report_charts(status_dist, trends)
+        for chart_title, drawing in charts:
+            story.append(KeepTogether([Paragraph(chart_title, heading_style), drawing]))
+            story.append(Spacer(1, 0.15*inch))
+        
         # Insights
         story.append(Paragraph("AI-Generated Insights", heading_style))
         insights_text = insights if isinstance(insights, str) else str(insights)
-        story.append(Paragraph(insights_text[:500], text_style))
+        for line in insights_text.splitlines():
+            if line.strip():
+                story.append(Paragraph(escape(line.strip()), text_style))
         story.append(Spacer(1, 0.2*inch))
         
         # Recommendations
@@ -139,7 +319,7 @@ def generate_pdf_report(df, metrics, status_dist, trends, insights):
         
         # Footer
         footer_text = "© 2024 AI Powered Data Analysis Generator | Confidential"
-        story.append(Paragraph(footer_text, ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey, alignment=TA_CENTER)))
+        story.append(Paragraph(footer_text, styles["footer"]))
         
         # Build PDF
         doc.build(story)
@@ -150,6 +330,48 @@ def generate_pdf_report(df, metrics, status_dist, trends, insights):
         # Fallback: return None if reportlab not installed
         return None
 
+def report_inputs(df):
+    """
+    Compute the aggregates a report is rendered from.
+    The result is small and independent of the dataframe, so it can be cached.
+    """
+    from analysis import get_order_status_distribution, get_monthly_trend, get_delivery_days_histogram
+    from metrics import calculate_metrics, delivery_performance_breakdown
+    from insights import generate_insights
+
+    return {
+        "metrics": calculate_metrics(df),
+        "status_dist": get_order_status_distribution(df),
+        "trends": get_monthly_trend(df),
+        "insights": generate_insights(df),
+        "delivery": delivery_performance_breakdown(df),
+        "delivery_days": get_delivery_days_histogram(df)
+    }
+
+def report_charts(inputs):
+    """Build the chart drawables for precomputed report inputs."""
+    return build_report_charts(
+        inputs["status_dist"], inputs["trends"], inputs["delivery"], inputs["delivery_days"]
+    )
+
+def render_report_bytes(inputs, charts=None):
+    """
+    Render the PDF from precomputed report inputs, returning its bytes.
+    Returns None if reportlab is not installed.
+    """
+    try:
+        if charts is None:
+            charts = report_charts(inputs)
+    except ImportError:
+        return None
+
+    pdf_buffer = generate_pdf_report(
+        None, inputs["metrics"], inputs["status_dist"], inputs["trends"], inputs["insights"], charts
+    )
+    if pdf_buffer is None:
+        return None
+    return pdf_buffer.getvalue()
+
 def generate_csv_report(df, metrics, status_dist, trends, insights):
     """
     Generate a CSV export of key data.
@@ -172,10 +394,19 @@ def generate_csv_report(df, metrics, status_dist, trends, insights):
 
 def get_report_downloads(df, metrics, status_dist, trends, insights):
     """
-    Return available report formats and generate them.
+    Return available report formats and the endpoints that serve them.
     """
-    return {
-        "pdf": "PDF report with detailed analysis",
-        "csv": "CSV export of data and metrics",
-        "json": "JSON format of all metrics and insights"
+    from exporter import EXPORT_TABLES, parquet_available
+
+    downloads = {
+        "pdf": {"description": "PDF report with detailed analysis", "url": "/report"},
+        "csv": {"description": "CSV export of data and aggregate tables", "url": "/export/orders?format=csv"},
+        "jsonl": {"description": "JSON Lines export of data and aggregate tables", "url": "/export/orders?format=jsonl"}
+    }
+    if parquet_available():
+        downloads["parquet"] = {"description": "Parquet export of data and aggregate tables", "url": "/export/orders?format=parquet"}
+    downloads["tables"] = {
+        table: {"description": description, "url": f"/export/{table}"}
+        for table, description in EXPORT_TABLES.items()
     }
+    return downloads
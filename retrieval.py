@@ -0,0 +1,254 @@
+"""
+Local retrieval layer for the chatbot.
+
+At load time the dataset is condensed into a catalog of short text facts
+(monthly volumes, status delivery stats, late rates by segment, anomaly
+summaries) which are indexed with BM25. Only the facts relevant to a
+question are put into the Gemini prompt. The forecast facts need a model
+fit (and the sklearn import), so they are added on the first search
+rather than at load time.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import pandas as pd
+
+from ml_engine import anomaly_detection, predict_future_orders
+
+MONTH_NAMES = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december"
+]
+WEEKDAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no signal for matching questions against facts
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from",
+    "had", "has", "have", "how", "in", "is", "it", "me", "of", "on", "or", "show", "tell",
+    "that", "the", "there", "this", "to", "was", "were", "what", "when", "which", "with"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [tok for tok in TOKEN_PATTERN.findall(text.lower()) if tok not in STOPWORDS]
+
+
+def _late_mask(df: pd.DataFrame) -> pd.Series:
+    return df['order_delivered_customer_date'] > df['order_estimated_delivery_date']
+
+
+def _fmt_days(value) -> str:
+    return "n/a" if pd.isna(value) else f"{value:.2f} days"
+
+
+def _segment_facts(df: pd.DataFrame, late: pd.Series, key: pd.Series, topic: str, label) -> List[Dict]:
+    """Order count, late rate and average delivery days per value of ``key``."""
+    grouped = pd.DataFrame({
+        'key': key,
+        'late': late,
+        'delivery_days': df['delivery_days']
+    }).groupby('key', observed=True).agg(
+        orders=('late', 'size'),
+        late_orders=('late', 'sum'),
+        avg_delivery=('delivery_days', 'mean')
+    )
+
+    facts = []
+    for value, row in grouped.iterrows():
+        late_rate = (row['late_orders'] / row['orders']) * 100 if row['orders'] else 0.0
+        facts.append({
+            "topic": topic,
+            "text": (
+                f"{label(value)}: {int(row['orders']):,} orders, late delivery rate "
+                f"{late_rate:.2f}%, average delivery time {_fmt_days(row['avg_delivery'])}."
+            )
+        })
+    return facts
+
+
+def build_fact_catalog(df: pd.DataFrame, forecast: bool = True) -> List[Dict]:
+    """
+    Materialize the dataset into a list of ``{"topic", "text"}`` facts.
+    Expects a frame that went through ``preprocess_data``. ``forecast=False``
+    leaves out the forecast facts (see ``forecast_facts``).
+    """
+    facts = []
+    total_orders = int(df.shape[0])
+    late = _late_mask(df)
+    purchase = df['order_purchase_timestamp']
+
+    # Overview
+    late_pct = (late.sum() / total_orders) * 100 if total_orders else 0.0
+    facts.append({
+        "topic": "overview",
+        "text": (
+            f"Dataset overview: {total_orders:,} orders total with {df.shape[1]} columns "
+            f"({', '.join(df.columns.tolist())}). Orders were purchased between "
+            f"{purchase.min()} and {purchase.max()}. Overall average delivery time "
+            f"{_fmt_days(df['delivery_days'].mean())}, overall late delivery rate {late_pct:.2f}%."
+        )
+    })
+
+    # Per-month volumes and delivery performance
+    month_key = purchase.dt.to_period('M')
+    facts.extend(_segment_facts(
+        df, late, month_key, "monthly",
+        lambda p: f"Month {p.year}-{p.month:02d} ({MONTH_NAMES[p.month - 1]} {p.year}) monthly orders"
+    ))
+
+    # Per-year volumes
+    facts.extend(_segment_facts(
+        df, late, df['purchase_year'], "yearly",
+        lambda y: f"Year {int(y)} yearly orders"
+    ))
+
+    # Per-status delivery stats
+    status_counts = df['order_status'].value_counts()
+    for status, count in status_counts.items():
+        share = (count / total_orders) * 100 if total_orders else 0.0
+        facts.append({
+            "topic": "status",
+            "text": f"Order status {status}: {int(count):,} orders ({share:.2f}% of all orders) status distribution."
+        })
+    facts.extend(_segment_facts(
+        df, late, df['order_status'], "status",
+        lambda s: f"Delivery stats for order status {s}"
+    ))
+
+    # Late rates by purchase weekday and hour-of-day segment
+    facts.extend(_segment_facts(
+        df, late, purchase.dt.dayofweek, "segment",
+        lambda d: f"Orders purchased on {WEEKDAY_NAMES[int(d)]} weekday segment"
+    ))
+    hour_bucket = pd.cut(
+        purchase.dt.hour, bins=[-1, 5, 11, 17, 23],
+        labels=["night (0-5h)", "morning (6-11h)", "afternoon (12-17h)", "evening (18-23h)"]
+    )
+    facts.extend(_segment_facts(
+        df, late, hour_bucket, "segment",
+        lambda h: f"Orders purchased in the {h} time of day segment"
+    ))
+
+    # Missing values
+    missing = df.isnull().sum()
+    missing = missing[missing > 0]
+    if not missing.empty:
+        facts.append({
+            "topic": "quality",
+            "text": "Missing null values per column: " + ", ".join(
+                f"{col} {int(count):,}" for col, count in missing.items()
+            ) + "."
+        })
+
+    # ML summaries
+    anomalies = anomaly_detection(df)
+    if anomalies.get("success"):
+        facts.append({
+            "topic": "anomalies",
+            "text": (
+                f"Delivery time anomalies (IQR outliers): {anomalies['anomalies_detected']:,} anomalous orders "
+                f"({anomalies['anomaly_percentage']}%), normal range {anomalies['lower_bound']} to "
+                f"{anomalies['upper_bound']} days, {anomalies['details']['fast_deliveries']:,} unusually fast and "
+                f"{anomalies['details']['slow_deliveries']:,} unusually slow deliveries."
+            )
+        })
+
+    if forecast:
+        facts.extend(forecast_facts(df))
+
+    for i, fact in enumerate(facts):
+        fact["id"] = i
+    return facts
+
+
+def forecast_facts(df: pd.DataFrame) -> List[Dict]:
+    """Facts from the order forecast, which fits a model."""
+    forecast = predict_future_orders(df, months_ahead=6)
+    if not forecast.get("success"):
+        return []
+    return [{
+        "topic": "forecast",
+        "text": "Forecast prediction of future monthly orders: " + ", ".join(
+            f"{f['year']}-{f['month']:02d} ({MONTH_NAMES[f['month'] - 1]}) {f['predicted_orders']:,}"
+            for f in forecast["forecast"]
+        ) + f". Trend model R2 {forecast['model_accuracy']}."
+    }]
+
+
+class FactIndex:
+    """
+    In-process BM25 index over a fact catalog. ``deferred`` returns more
+    facts; it is called, and the index rebuilt, on the first search.
+    """
+
+    def __init__(self, facts: List[Dict], k1: float = 1.5, b: float = 0.75, deferred=None):
+        self.k1 = k1
+        self.b = b
+        self._deferred = deferred
+        self._lock = threading.Lock()
+        self._index(facts)
+
+    def _index(self, facts: List[Dict]):
+        self.facts = facts
+        self._doc_terms = [Counter(tokenize(fact["text"] + " " + fact["topic"])) for fact in facts]
+        self._doc_lengths = [sum(terms.values()) for terms in self._doc_terms]
+        self._avg_length = (sum(self._doc_lengths) / len(facts)) if facts else 0.0
+
+        self._postings = defaultdict(list)
+        for doc_id, terms in enumerate(self._doc_terms):
+            for term, freq in terms.items():
+                self._postings[term].append((doc_id, freq))
+
+        n_docs = len(facts)
+        self._idf = {
+            term: math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def _complete(self):
+        """Add the deferred facts once."""
+        with self._lock:
+            if self._deferred is None:
+                return
+            extra = self._deferred()
+            facts = self.facts + [{**fact, "id": len(self.facts) + i} for i, fact in enumerate(extra)]
+            self._index(facts)
+            self._deferred = None
+
+    def __len__(self):
+        return len(self.facts)
+
+    def search(self, question: str, top_k: int = 8) -> List[Dict]:
+        """Return the ``top_k`` facts ranked by BM25 score for ``question``."""
+        if self._deferred is not None:
+            self._complete()
+        scores = defaultdict(float)
+        for term in set(tokenize(question)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, freq in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / self._avg_length)
+                scores[doc_id] += idf * (freq * (self.k1 + 1)) / (freq + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [self.facts[doc_id] for doc_id, _ in ranked]
+
+    def overview(self) -> str:
+        """Text of the overview fact, included with every prompt."""
+        for fact in self.facts:
+            if fact["topic"] == "overview":
+                return fact["text"]
+        return ""
+
+
+def build_fact_index(df: pd.DataFrame) -> FactIndex:
+    """Build the fact catalog for ``df`` and index it; the forecast facts follow on the first search."""
+    return FactIndex(build_fact_catalog(df, forecast=False), deferred=lambda: forecast_facts(df))
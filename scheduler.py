@@ -0,0 +1,343 @@
+"""
+Admission control for the API routes.
+
+Every endpoint belongs to a cost class. Each class has its own
+concurrency limit and a bounded queue of requests waiting for a slot,
+so a burst of reports or ML requests can only fill the heavy class and
+cheap aggregate routes keep answering. A request that finds the queue
+full is rejected with 429; one that waits longer than the class allows
+gets 503. Both carry a Retry-After estimated from the class's recent
+service times. Identical heavy requests that arrive while one is
+already running wait for it and receive a copy of its response; they
+take room in the class queue while they wait.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+from profiling import QUEUE_WAIT, ADMISSION_REJECTIONS, ADMISSION_DEDUPLICATED, register_gauge
+
+# Never queued: the page itself, health and memory checks, metrics and the long-lived event stream
+EXEMPT_ENDPOINTS = {"home", "static", "health", "ready", "metrics_internal", "events", "memory"}
+
+# Model fits, report rendering, LLM calls and full-frame scans
+HEAVY_ENDPOINTS = {
+    "chatbot", "predict", "score", "clustering", "ml_insights", "correlations",
+    "cohorts", "report", "dashboard", "export", "data_quality", "simulate"
+}
+
+DEFAULT_CLASS = "light"
+
+
+def _env_number(name, default, cast=int):
+    return cast(os.getenv(name, str(default)))
+
+
+# (concurrent requests, queued requests, seconds a request may wait for a slot)
+COST_CLASSES = {
+    "light": (
+        _env_number("ADMISSION_LIGHT_CONCURRENCY", 16),
+        _env_number("ADMISSION_LIGHT_QUEUE", 64),
+        _env_number("ADMISSION_LIGHT_WAIT_SECONDS", 5, float)
+    ),
+    "heavy": (
+        _env_number("ADMISSION_HEAVY_CONCURRENCY", 2),
+        _env_number("ADMISSION_HEAVY_QUEUE", 8),
+        _env_number("ADMISSION_HEAVY_WAIT_SECONDS", 30, float)
+    )
+}
+
+# How long a duplicate request waits for the running one before running itself
+DEDUP_WAIT_SECONDS = _env_number("ADMISSION_DEDUP_WAIT_SECONDS", 120, float)
+# Larger responses are not kept for duplicates
+DEDUP_MAX_BYTES = _env_number("ADMISSION_DEDUP_MAX_BYTES", 16 * 1024 * 1024)
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, cost_class, status, reason, retry_after):
+        super().__init__(reason)
+        self.cost_class = cost_class
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CostClass:
+    """A concurrency limit with a bounded wait queue."""
+
+    def __init__(self, name, concurrency, queue_size, max_wait):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        # Duplicates waiting for an identical request; they hold queue room but no slot
+        self.following = 0
+        # Moving average of how long an admitted request holds its slot
+        self.service_seconds = 1.0
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to be free, rounded up."""
+        with self._lock:
+            backlog = (self.waiting + 1) / self.concurrency
+            return max(1, math.ceil(backlog * self.service_seconds))
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed. Returns the seconds waited."""
+        with self._lock:
+            if self._slots.acquire(blocking=False):
+                self.active += 1
+                return 0.0
+            if self.waiting + self.following >= self.queue_size:
+                full = True
+            else:
+                full = False
+                self.waiting += 1
+        if full:
+            raise Overloaded(self.name, 429, "queue_full", self.retry_after())
+
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.max_wait)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+        if not acquired:
+            raise Overloaded(self.name, 503, "queue_timeout", self.retry_after())
+        return waited
+
+    def follow(self):
+        """Take queue room for a duplicate request, or raise 429 when the queue is full."""
+        with self._lock:
+            full = self.waiting + self.following >= self.queue_size
+            if not full:
+                self.following += 1
+        if full:
+            raise Overloaded(self.name, 429, "queue_full", self.retry_after())
+
+    def unfollow(self):
+        with self._lock:
+            self.following -= 1
+
+    def release(self, held_seconds):
+        with self._lock:
+            self.active -= 1
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+        self._slots.release()
+
+    def status(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "max_wait_seconds": self.max_wait,
+                "active": self.active,
+                "waiting": self.waiting,
+                "following": self.following,
+                "avg_service_seconds": round(self.service_seconds, 4)
+            }
+
+
+class _Flight:
+    """A heavy request in progress that identical requests can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+class Scheduler:
+    """Classifies endpoints and admits requests to their cost class."""
+
+    def __init__(self, classes=COST_CLASSES, heavy=HEAVY_ENDPOINTS, exempt=EXEMPT_ENDPOINTS):
+        self.classes = {name: CostClass(name, *limits) for name, limits in classes.items()}
+        self.heavy = set(heavy)
+        self.exempt = set(exempt)
+        self.gates = []
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    def classify(self, endpoint):
+        """Cost class name for an endpoint, or None when it is never queued."""
+        if endpoint is None or endpoint in self.exempt:
+            return None
+        return "heavy" if endpoint in self.heavy else DEFAULT_CLASS
+
+    def add_gate(self, gate):
+        """
+        ``gate(class_name, endpoint)`` is asked before a request queues; a
+        returned reason, or ``(reason, retry_after)``, rejects it with 503.
+        Without a retry_after the class's own estimate is used.
+        """
+        self.gates.append(gate)
+
+    def admit(self, class_name, endpoint=None):
+        cost_class = self.classes[class_name]
+        for gate in self.gates:
+            verdict = gate(class_name, endpoint)
+            if verdict:
+                reason, retry_after = verdict if isinstance(verdict, tuple) else (verdict, cost_class.retry_after())
+                raise Overloaded(class_name, 503, reason, retry_after)
+        waited = cost_class.acquire()
+        QUEUE_WAIT.observe((class_name,), waited)
+        return waited
+
+    def release(self, class_name, held_seconds):
+        self.classes[class_name].release(held_seconds)
+
+    def join(self, key):
+        """
+        Register a request under ``key``. Returns ``(flight, leader)``:
+        the leader runs the request, everyone else waits for its response.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def wait_for(self, class_name, flight, timeout=DEDUP_WAIT_SECONDS):
+        """
+        Wait for the leader of ``flight`` while holding queue room in the
+        class. Returns its shared response, or None if there is none in time.
+        """
+        cost_class = self.classes[class_name]
+        cost_class.follow()
+        try:
+            if flight.done.wait(timeout):
+                return flight.response
+            return None
+        finally:
+            cost_class.unfollow()
+
+    def finish(self, key, flight, response=None):
+        """Publish the leader's response (None if it cannot be shared) and wake the waiters."""
+        with self._flights_lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.response = response
+        flight.done.set()
+
+    def status(self):
+        with self._flights_lock:
+            in_flight = len(self._flights)
+        return {
+            "classes": {name: cost_class.status() for name, cost_class in self.classes.items()},
+            "deduplicating": in_flight
+        }
+
+
+# Request headers that change the response: its encoding, format and conditional 304
+KEY_HEADERS = ("Accept", "Accept-Encoding", "If-None-Match")
+
+
+def request_key(request):
+    """Identity of a request for deduplication: method, path, query, negotiating headers and body."""
+    digest = hashlib.sha1(request.method.encode())
+    digest.update(request.path.encode())
+    for name, value in sorted(request.args.items(multi=True)):
+        digest.update(f"\0{name}={value}".encode())
+    for name in KEY_HEADERS:
+        digest.update(f"\0{name}:{request.headers.get(name, '')}".encode())
+    if request.method not in ("GET", "HEAD"):
+        digest.update(b"\0")
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _snapshot(response):
+    """Status, headers and body of a buffered response, or None for streamed or large ones."""
+    if not response.is_sequence or response.direct_passthrough:
+        return None
+    body = response.get_data()
+    if len(body) > DEDUP_MAX_BYTES:
+        return None
+    return response.status, list(response.headers.items()), body
+
+
+def init_app(app, scheduler=None):
+    """Register the admission hooks. Returns the scheduler."""
+    from flask import Response, g, jsonify, request
+
+    scheduler = scheduler or Scheduler()
+    register_gauge(
+        "app_admission_active", "Requests holding a slot per cost class.",
+        lambda: {name: c.active for name, c in scheduler.classes.items()}, label_name="cost_class"
+    )
+    register_gauge(
+        "app_admission_waiting", "Requests queued for a slot per cost class.",
+        lambda: {name: c.waiting for name, c in scheduler.classes.items()}, label_name="cost_class"
+    )
+
+    def rejected(error):
+        ADMISSION_REJECTIONS.inc((error.cost_class, error.reason))
+        body = jsonify({
+            "error": "Server is busy, retry later",
+            "reason": error.reason,
+            "cost_class": error.cost_class,
+            "retry_after": error.retry_after
+        })
+        return body, error.status, {"Retry-After": str(error.retry_after)}
+
+    @app.before_request
+    def _admit_request():
+        class_name = scheduler.classify(request.endpoint)
+        if class_name is None:
+            return None
+
+        if class_name == "heavy":
+            key = request_key(request)
+            flight, leader = scheduler.join(key)
+            if leader:
+                g.admission_flight = (key, flight)
+            else:
+                try:
+                    shared = scheduler.wait_for(class_name, flight)
+                except Overloaded as e:
+                    return rejected(e)
+                if shared is not None:
+                    ADMISSION_DEDUPLICATED.inc((request.endpoint,))
+                    status, headers, body = shared
+                    return Response(body, status=status, headers=headers)
+
+        try:
+            waited = scheduler.admit(class_name, request.endpoint)
+        except Overloaded as e:
+            return rejected(e)
+        g.admission = (class_name, time.perf_counter())
+        g.admission_wait = waited
+        return None
+
+    @app.after_request
+    def _share_response(response):
+        if "admission_wait" in g and g.admission_wait:
+            response.headers["X-Queue-Wait"] = f"{g.admission_wait:.3f}"
+        entry = g.pop("admission_flight", None)
+        if entry is not None:
+            key, flight = entry
+            shareable = response.status_code < 500 and response.status_code != 429
+            scheduler.finish(key, flight, _snapshot(response) if shareable else None)
+        return response
+
+    @app.teardown_request
+    def _release_slot(error=None):
+        entry = g.pop("admission_flight", None)
+        if entry is not None:
+            # The request failed before after_request ran
+            scheduler.finish(*entry)
+        admission = g.pop("admission", None)
+        if admission is not None:
+            class_name, started = admission
+            scheduler.release(class_name, time.perf_counter() - started)
+
+    return scheduler
@@ -0,0 +1,128 @@
+"""
+Fast response encoding.
+
+``dumps`` uses orjson (with native NumPy support) when it is installed
+and falls back to the standard library with a NumPy-aware default.
+Tabular results can also be sent column-wise, either as JSON
+``{column: [values]}`` or as an Arrow IPC stream.
+"""
+
+import datetime
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+
+def _default(obj):
+    """Encode the NumPy and pandas values neither encoder handles natively."""
+    if isinstance(obj, np.generic):
+        value = obj.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f":
+            return np.where(np.isfinite(obj), obj, None).tolist()
+        # Object arrays can hold NaN too; the stdlib encoder rejects it
+        return _clean_floats(obj.tolist())
+    if isinstance(obj, pd.Timestamp):
+        return None if pd.isna(obj) else obj.isoformat()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, pd.Period):
+        return str(obj)
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _clean_floats(obj):
+    """Replace NaN/inf with None so the stdlib encoder emits valid JSON."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _clean_floats(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_clean_floats(value) for value in obj]
+    return obj
+
+
+def dumps(obj):
+    """Encode ``obj`` to JSON bytes."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. non-contiguous or object-dtype arrays; take the slow path
+            pass
+    return json.dumps(_clean_floats(obj), default=_default, allow_nan=False).encode("utf-8")
+
+
+def column_values(series):
+    """
+    A column as something the encoders handle without per-value Python work:
+    numeric columns stay NumPy arrays (NaN becomes None), datetimes become ISO strings.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.strftime("%Y-%m-%dT%H:%M:%S").to_numpy(dtype=object)
+        values[series.isna().to_numpy()] = None
+        return values.tolist()
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return series.to_numpy()
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            return np.where(np.isnan(values), None, values).tolist()
+        return values
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def columnar(frame):
+    """``{column: [values]}`` for a DataFrame."""
+    return {str(col): column_values(frame[col]) for col in frame.columns}
+
+
+def arrow_ipc_bytes(frame):
+    """Encode a DataFrame as an Arrow IPC stream. Requires pyarrow."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def negotiate_table_format(args, accept):
+    """
+    Pick the encoding for a tabular response: ``arrow`` when the client
+    accepts the Arrow stream type or passes format=arrow, ``columnar`` for
+    format=columnar, otherwise ``records`` (the route's default shape).
+    """
+    requested = (args.get("format") or "").lower()
+    if requested == "arrow" or ARROW_MIMETYPE in (accept or ""):
+        return "arrow"
+    if requested == "columnar":
+        return "columnar"
+    return "records"
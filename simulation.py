@@ -0,0 +1,184 @@
+"""
+What-if delivery simulation.
+
+A scenario shifts the estimated delivery date, shifts or scales the
+time to delivery, and optionally restricts the order statuses. The
+timestamps are reduced once per dataset version to two int64-derived
+arrays (delivered minus estimated, delivered minus purchase), and every
+scenario is evaluated in one broadcast (scenarios x rows) pass, in row
+blocks so the temporaries stay bounded:
+
+    late  <=>  (delivered - estimated) + (scale - 1) * lag + delivery_offset - estimate_offset > 0
+
+With no offsets and a scale of 1 this is exactly the comparison
+``calculate_metrics`` and ``delivery_performance_breakdown`` make.
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from metrics import metrics_from_totals
+
+NS_PER_DAY = 86_400 * 10**9
+
+SIMULATE_MAX_SCENARIOS = int(os.getenv("SIMULATE_MAX_SCENARIOS", "1000"))
+# Scenario x row cells evaluated per block
+SIMULATE_BLOCK_CELLS = int(os.getenv("SIMULATE_BLOCK_CELLS", "4000000"))
+
+SCENARIO_FIELDS = {
+    "name": None,
+    "estimate_offset_days": 0.0,
+    "delivery_offset_days": 0.0,
+    "delivery_lag_scale": 1.0,
+    "statuses": None
+}
+
+
+def _nanoseconds(series):
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class SimulationArrays:
+    """The per-order arrays every scenario is evaluated on, built once per dataset version."""
+
+    def __init__(self, df):
+        delivered = df['order_delivered_customer_date']
+        estimated = df['order_estimated_delivery_date']
+        purchase = df['order_purchase_timestamp']
+        has_delivered = delivered.notna().to_numpy()
+
+        # Differences in int64 first, so the unshifted comparison is exact
+        gap = (_nanoseconds(delivered) - _nanoseconds(estimated)).astype(np.float64)
+        gap[~(has_delivered & estimated.notna().to_numpy())] = np.nan
+        lag = (_nanoseconds(delivered) - _nanoseconds(purchase)).astype(np.float64)
+        lag[~(has_delivered & purchase.notna().to_numpy())] = np.nan
+
+        self.gap = gap
+        self.lag = lag
+        # Lag without NaN for the scaling term; rows without a purchase time are not scaled
+        self.lag_or_zero = np.nan_to_num(lag)
+        self.has_lag = ~np.isnan(lag)
+        codes, statuses = pd.factorize(df['order_status'])
+        self.status_codes = codes
+        self.statuses = [str(status) for status in statuses]
+        self.rows = int(len(df))
+
+
+def parse_scenarios(raw):
+    """
+    Validate a list of scenario dicts and fill in the defaults.
+    Raises ValueError with a message for the client.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("Expected a non-empty list of scenarios")
+    if len(raw) > SIMULATE_MAX_SCENARIOS:
+        raise ValueError(f"At most {SIMULATE_MAX_SCENARIOS} scenarios per request")
+
+    scenarios = []
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"Scenario {i} must be an object")
+        unknown = sorted(set(item) - set(SCENARIO_FIELDS))
+        if unknown:
+            raise ValueError(f"Scenario {i}: unknown fields {unknown}; expected {sorted(SCENARIO_FIELDS)}")
+
+        scenario = {**SCENARIO_FIELDS, **item}
+        scenario["name"] = str(scenario["name"]) if scenario["name"] is not None else f"scenario_{i}"
+        for field in ("estimate_offset_days", "delivery_offset_days", "delivery_lag_scale"):
+            value = scenario[field]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError(f"Scenario {i}: {field} must be a finite number")
+            scenario[field] = float(value)
+        if scenario["delivery_lag_scale"] < 0:
+            raise ValueError(f"Scenario {i}: delivery_lag_scale must not be negative")
+        statuses = scenario["statuses"]
+        if statuses is not None and (not isinstance(statuses, list) or not all(isinstance(s, str) for s in statuses)):
+            raise ValueError(f"Scenario {i}: statuses must be a list of strings")
+        scenarios.append(scenario)
+    return scenarios
+
+
+def _status_masks(arrays, scenarios):
+    """
+    (scenarios, statuses + 1) lookup of which status codes each scenario
+    keeps. The extra last column is the missing status (code -1).
+    """
+    allowed = np.ones((len(scenarios), len(arrays.statuses) + 1), dtype=bool)
+    index = {status: i for i, status in enumerate(arrays.statuses)}
+    for row, scenario in enumerate(scenarios):
+        if scenario["statuses"] is not None:
+            allowed[row] = False
+            allowed[row, [index[s] for s in scenario["statuses"] if s in index]] = True
+    return allowed
+
+
+def simulate(arrays, scenarios, block_cells=SIMULATE_BLOCK_CELLS):
+    """
+    ``calculate_metrics`` and ``delivery_performance_breakdown`` for every
+    scenario, in the order given.
+    """
+    n = len(scenarios)
+    scale = np.array([s["delivery_lag_scale"] for s in scenarios])[:, None]
+    delivery_shift = np.array([s["delivery_offset_days"] for s in scenarios])[:, None] * NS_PER_DAY
+    shift = delivery_shift - np.array([s["estimate_offset_days"] for s in scenarios])[:, None] * NS_PER_DAY
+    allowed = _status_masks(arrays, scenarios)
+    filtered = any(s["statuses"] is not None for s in scenarios)
+
+    orders = np.zeros(n, dtype=np.int64)
+    late = np.zeros(n, dtype=np.int64)
+    on_time = np.zeros(n, dtype=np.int64)
+    days_sum = np.zeros(n)
+    days_count = np.zeros(n, dtype=np.int64)
+
+    block = max(1, block_cells // n)
+    for start in range(0, arrays.rows, block):
+        stop = min(start + block, arrays.rows)
+        gap = arrays.gap[start:stop][None, :]
+        lag = arrays.lag[start:stop][None, :]
+        in_scope = allowed[:, arrays.status_codes[start:stop]] if filtered else None
+
+        adjusted = gap + (scale - 1) * arrays.lag_or_zero[start:stop][None, :] + shift
+        is_late = adjusted > 0
+        is_on_time = adjusted <= 0
+        # Same flooring as preprocessing's .dt.days
+        days = np.floor((lag * scale + delivery_shift) / NS_PER_DAY)
+        has_days = np.broadcast_to(arrays.has_lag[start:stop][None, :], days.shape)
+
+        if in_scope is not None:
+            is_late &= in_scope
+            is_on_time &= in_scope
+            has_days = has_days & in_scope
+            orders += in_scope.sum(axis=1)
+        else:
+            orders += stop - start
+        late += is_late.sum(axis=1)
+        on_time += is_on_time.sum(axis=1)
+        days_sum += np.where(has_days, days, 0).sum(axis=1)
+        days_count += has_days.sum(axis=1)
+
+    results = []
+    for i, scenario in enumerate(scenarios):
+        average = days_sum[i] / days_count[i] if days_count[i] else None
+        results.append({
+            "name": scenario["name"],
+            "scenario": {field: scenario[field] for field in SCENARIO_FIELDS if field != "name"},
+            "metrics": metrics_from_totals(int(orders[i]), average if orders[i] else 0.0, int(late[i])),
+            "delivery_breakdown": {"on_time_deliveries": int(on_time[i]), "late_deliveries": int(late[i])}
+        })
+    return results
+
+
+def simulate_with_baseline(arrays, scenarios):
+    """Scenario results plus the unchanged baseline and each scenario's change against it."""
+    baseline_scenario = {**SCENARIO_FIELDS, "name": "baseline"}
+    *results, baseline = simulate(arrays, scenarios + [baseline_scenario])
+    base = baseline["metrics"]
+    for result in results:
+        result["change"] = {
+            key: round(result["metrics"][key] - base[key], 2)
+            for key in ("total_orders", "average_delivery_days", "late_delivery_percentage")
+        }
+    return {"rows": arrays.rows, "statuses": arrays.statuses, "baseline": baseline, "scenarios": results}
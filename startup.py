@@ -0,0 +1,47 @@
+"""
+Startup cost tracking and deferred imports.
+
+Heavy optional modules (sklearn, google.generativeai) are imported on
+first use through ``lazy_import``, which records how long each import
+took. Startup phases are timed with ``startup_phase``.
+"""
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+PROCESS_STARTED = time.perf_counter()
+
+IMPORT_TIMES = {}
+STARTUP_TIMINGS = {}
+_import_lock = threading.Lock()
+
+
+def lazy_import(name):
+    """Import ``name`` on first use and record the time the import took."""
+    with _import_lock:
+        if name not in IMPORT_TIMES:
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            IMPORT_TIMES[name] = round(time.perf_counter() - start, 4)
+            return module
+    return importlib.import_module(name)
+
+
+@contextmanager
+def startup_phase(name):
+    """Record the duration of a startup phase in seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = round(time.perf_counter() - start, 4)
+
+
+def startup_report():
+    return {
+        "phases": dict(STARTUP_TIMINGS),
+        "lazy_imports": dict(IMPORT_TIMES),
+        "uptime_seconds": round(time.perf_counter() - PROCESS_STARTED, 2)
+    }
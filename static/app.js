@@ -234,40 +234,38 @@ function downloadPDF() {
   setTimeout(() => setText("status", "Ready"), 2000);
 }
 
+let dashboardSections = {};
+let dashboardVersion = null;
+
+function renderDashboard(sections) {
+  const { metrics, status, trend, insights, delivery, quality, predictions, anomalies, clustering } = sections;
+  allData = { status, trend, metrics };
+
+  setText("total-orders", metrics.total_orders?.toLocaleString() || "-");
+  setText("avg-delivery", metrics.average_delivery_days || "-");
+  setText("late-pct", (metrics.late_delivery_percentage || 0).toFixed(2) + "%");
+  setText("on-time-count", (delivery.on_time_deliveries || 0).toLocaleString());
+
+  renderStatusTable(status);
+  renderDeliveryList(delivery);
+  renderQualityReport(quality);
+  renderPredictions(predictions);
+  renderAnomalies(anomalies);
+  renderClustering(clustering);
+
+  initStatusChart(status);
+  initDeliveryChart(delivery);
+  initTrendChart(trend);
+
+  setText("insight-text", insights.insight || "No insights available");
+}
+
 async function refreshData() {
   setText("status", "Loading...");
   try {
-    const [metrics, status, trend, insights, delivery, quality, predictions, anomalies, clustering] = await Promise.all([
-      getJSON("/metrics"),
-      getJSON("/order-status"),
-      getJSON("/monthly-trend"),
-      getJSON("/insights"),
-      getJSON("/delivery-breakdown"),
-      getJSON("/data-quality"),
-      getJSON("/predict"),
-      getJSON("/anomalies"),
-      getJSON("/clustering")
-    ]);
-
-    allData = { status, trend, metrics };
-
-    setText("total-orders", metrics.total_orders?.toLocaleString() || "-");
-    setText("avg-delivery", metrics.average_delivery_days || "-");
-    setText("late-pct", (metrics.late_delivery_percentage || 0).toFixed(2) + "%");
-    setText("on-time-count", (delivery.on_time_deliveries || 0).toLocaleString());
-
-    renderStatusTable(status);
-    renderDeliveryList(delivery);
-    renderQualityReport(quality);
-    renderPredictions(predictions);
-    renderAnomalies(anomalies);
-    renderClustering(clustering);
-    
-    initStatusChart(status);
-    initDeliveryChart(delivery);
-    initTrendChart(trend);
-
-    setText("insight-text", insights.insight || "No insights available");
+    // One batched request; the browser revalidates it with the ETag on reload
+    dashboardSections = await getJSON("/dashboard");
+    renderDashboard(dashboardSections);
     setText("status", "Ready");
   } catch (error) {
     setText("insight-text", `Error: ${error.message}`);
@@ -275,7 +273,55 @@ async function refreshData() {
   }
 }
 
-document.addEventListener("DOMContentLoaded", refreshData);
+function applyDiff(changes) {
+  Object.entries(changes).forEach(([name, change]) => {
+    if ("replace" in change) {
+      dashboardSections[name] = change.replace;
+      return;
+    }
+    const section = { ...(dashboardSections[name] || {}), ...change.set };
+    change.unset.forEach(key => delete section[key]);
+    dashboardSections[name] = section;
+  });
+  renderDashboard(dashboardSections);
+  setText("status", "Updated");
+}
+
+// Live updates: the server pushes the changed sections when the dataset changes
+function connectEvents() {
+  if (!window.EventSource) {
+    refreshData();
+    return;
+  }
+  const source = new EventSource("/events");
+
+  source.addEventListener("hello", event => {
+    const { version } = JSON.parse(event.data);
+    // First connect, or reconnected after missing updates
+    if (version !== dashboardVersion) {
+      dashboardVersion = version;
+      refreshData();
+    }
+  });
+
+  source.addEventListener("diff", event => {
+    const message = JSON.parse(event.data);
+    const inSync = message.previous_version === dashboardVersion && dashboardVersion !== null;
+    dashboardVersion = message.version;
+    if (inSync) {
+      applyDiff(message.sections);
+    } else {
+      refreshData();
+    }
+  });
+
+  source.addEventListener("resync", event => {
+    dashboardVersion = JSON.parse(event.data).version;
+    refreshData();
+  });
+}
+
+document.addEventListener("DOMContentLoaded", connectEvents);
 
 // ===========================
 // Chatbot Functions
@@ -0,0 +1,103 @@
+"""Every analytics backend must answer exactly like the pandas backend."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parallel
+from backends import DUCKDB_AVAILABLE, PandasBackend, check_backend_parity, create_backend
+from data_loader import dataset_fingerprint, load_data
+from parallel import PartitionedBackend
+from preprocessing import preprocess_data
+
+STATUSES = ["delivered", "shipped", "canceled", "invoiced", "processing"]
+
+
+def _orders(rows=300, seed=7):
+    rng = np.random.default_rng(seed)
+    purchase = pd.Timestamp("2017-01-01") + pd.to_timedelta(rng.integers(0, 700 * 86_400, rows), unit="s")
+    approved = purchase + pd.to_timedelta(rng.integers(0, 86_400, rows), unit="s")
+    carrier = approved + pd.to_timedelta(rng.integers(0, 5 * 86_400, rows), unit="s")
+    delivered = carrier + pd.to_timedelta(rng.integers(0, 30 * 86_400, rows), unit="s")
+    estimated = (purchase + pd.to_timedelta(rng.integers(5, 40, rows), unit="D")).normalize()
+    df = pd.DataFrame({
+        "order_id": [f"o{i:06d}" for i in range(rows)],
+        "customer_id": [f"c{i % 97:05d}" for i in range(rows)],
+        "order_status": rng.choice(STATUSES, rows),
+        "order_purchase_timestamp": purchase,
+        "order_approved_at": approved,
+        "order_delivered_carrier_date": carrier,
+        "order_delivered_customer_date": delivered,
+        "order_estimated_delivery_date": estimated
+    })
+    # Undelivered orders have no delivery date
+    df.loc[df["order_status"] != "delivered", "order_delivered_customer_date"] = pd.NaT
+    return df
+
+
+def _write(df, path):
+    df.to_csv(path, index=False, date_format="%Y-%m-%d %H:%M:%S")
+    return path
+
+
+@pytest.fixture
+def orders_csv(tmp_path):
+    df = _orders().astype(object)
+    # Unparseable timestamps become NaT
+    df.loc[3, "order_purchase_timestamp"] = "not a date"
+    df.loc[5, "order_estimated_delivery_date"] = "2018-13-45"
+    df.loc[8, "order_delivered_customer_date"] = ""
+    # Rows with nothing but an id, and a missing status
+    df.loc[10, df.columns[1:]] = None
+    df.loc[11, df.columns[2:]] = None
+    df.loc[12, "order_status"] = None
+    return _write(df, tmp_path / "orders.csv")
+
+
+@pytest.fixture
+def all_nat_csv(tmp_path):
+    df = _orders(rows=20).astype(object)
+    df.loc[:, "order_delivered_customer_date"] = None
+    df.loc[:, "order_estimated_delivery_date"] = None
+    return _write(df, tmp_path / "undelivered.csv")
+
+
+def _backend_names():
+    names = ["sqlite", "parallel"]
+    if DUCKDB_AVAILABLE:
+        names.append("duckdb")
+    return names
+
+
+def _assert_parity(csv_path, name):
+    reference = PandasBackend(preprocess_data(load_data(csv_path)))
+    backend = create_backend(name, df=reference.df, csv_path=csv_path, version=dataset_fingerprint(csv_path))
+    try:
+        assert check_backend_parity(reference, backend) == []
+    finally:
+        backend.close()
+
+
+@pytest.mark.parametrize("name", _backend_names())
+def test_backends_match_pandas(orders_csv, name):
+    _assert_parity(orders_csv, name)
+
+
+@pytest.mark.parametrize("name", _backend_names())
+def test_backends_match_pandas_without_delivery_dates(all_nat_csv, name):
+    _assert_parity(all_nat_csv, name)
+
+
+def test_parallel_merges_partitions_from_the_pool(orders_csv, monkeypatch):
+    # Force the process pool and mmapped columns even on a single-core machine
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 2)
+    parallel.shutdown_pool()
+    reference = PandasBackend(preprocess_data(load_data(orders_csv)))
+    backend = PartitionedBackend(reference.df, partition_rows=64)
+    try:
+        assert len(parallel.partition_bounds(backend.rows, backend.partition_rows)) >= 3
+        assert check_backend_parity(reference, backend) == []
+        assert backend._columns is not None
+    finally:
+        backend.close()
+        parallel.shutdown_pool()
@@ -0,0 +1,62 @@
+"""Multi-table queries when the related tables repeat their keys."""
+
+import pandas as pd
+
+from olist_tables import OlistCatalog, RELATED_TABLES, seller_delivery_metrics, state_delivery_metrics
+from preprocessing import preprocess_data
+
+
+def _orders():
+    return preprocess_data(pd.DataFrame({
+        "order_id": ["o1", "o2", "o3"],
+        "customer_id": ["c1", "c2", "c3"],
+        "order_status": ["delivered", "delivered", "shipped"],
+        "order_purchase_timestamp": ["2018-01-01 10:00:00", "2018-01-02 10:00:00", "2018-01-03 10:00:00"],
+        "order_approved_at": ["2018-01-01 11:00:00", "2018-01-02 11:00:00", "2018-01-03 11:00:00"],
+        "order_delivered_carrier_date": ["2018-01-02 10:00:00", "2018-01-03 10:00:00", None],
+        "order_delivered_customer_date": ["2018-01-05 10:00:00", "2018-01-20 10:00:00", None],
+        "order_estimated_delivery_date": ["2018-01-10 00:00:00", "2018-01-10 00:00:00", "2018-01-15 00:00:00"]
+    }))
+
+
+def _catalog(tmp_path, sellers, customers):
+    pd.DataFrame({
+        "order_id": ["o1", "o1", "o2", "o3"],
+        "order_item_id": [1, 2, 1, 1],
+        "product_id": ["p1", "p2", "p1", "p3"],
+        "seller_id": ["s1", "s2", "s1", "s2"],
+        "shipping_limit_date": ["2018-01-02 00:00:00"] * 4,
+        "price": [10.0, 20.0, 30.0, 40.0],
+        "freight_value": [1.0, 2.0, 3.0, 4.0]
+    }).to_csv(tmp_path / RELATED_TABLES["items"], index=False)
+    pd.DataFrame(sellers, columns=["seller_id", "seller_zip_code_prefix", "seller_city", "seller_state"]).to_csv(
+        tmp_path / RELATED_TABLES["sellers"], index=False
+    )
+    pd.DataFrame(customers, columns=["customer_id", "customer_unique_id", "customer_zip_code_prefix", "customer_city", "customer_state"]).to_csv(
+        tmp_path / RELATED_TABLES["customers"], index=False
+    )
+    return OlistCatalog(_orders(), tmp_path)
+
+
+def test_duplicate_seller_rows_use_the_first(tmp_path):
+    catalog = _catalog(
+        tmp_path,
+        sellers=[("s1", 1000, "city", "SP"), ("s2", 2000, "city", "RJ"), ("s1", 3000, "city", "MG")],
+        customers=[("c1", "u1", 1, "city", "SP"), ("c2", "u2", 2, "city", "RJ"), ("c3", "u3", 3, "city", "MG")]
+    )
+    rows = {row["seller_id"]: row for row in seller_delivery_metrics(catalog)}
+    assert rows["s1"]["seller_state"] == "SP"
+    assert rows["s2"]["seller_state"] == "RJ"
+    assert rows["s1"]["orders"] == 2
+    assert rows["s2"]["orders"] == 2
+
+
+def test_duplicate_customer_rows_use_the_first(tmp_path):
+    catalog = _catalog(
+        tmp_path,
+        sellers=[("s1", 1000, "city", "SP"), ("s2", 2000, "city", "RJ")],
+        customers=[("c1", "u1", 1, "city", "SP"), ("c1", "u1", 1, "city", "BA"), ("c2", "u2", 2, "city", "RJ")]
+    )
+    rows = {row["customer_state"]: row["orders"] for row in state_delivery_metrics(catalog)}
+    # o3's customer is missing from the table
+    assert rows == {"SP": 1, "RJ": 1}